@@ -1,3 +1,10 @@
-from .settings import GOOGLE_SERVICE_JSON, MFJ_TRACKER_SHEET_ID
+from . import settings
 
-__all__ = ['GOOGLE_SERVICE_JSON', 'MFJ_TRACKER_SHEET_ID']
\ No newline at end of file
+__all__ = ['GOOGLE_SERVICE_JSON', 'MFJ_TRACKER_SHEET_ID']
+
+
+def __getattr__(name):
+    # resolved through settings on first access (GOOGLE_SERVICE_JSON reads a file)
+    if name in __all__:
+        return getattr(settings, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -8,7 +8,6 @@ MYFUTUREJOBS_USER = os.getenv('MYFUTUREJOBS_USER')
 MYFUTUREJOBS_PASS = os.getenv('MYFUTUREJOBS_PASS')
 MYFUTUREJOBS_URL = os.getenv('MYFUTUREJOBS_URL')
 GOOGLE_SERVICE_FILE = os.path.join("credentials", "googleservice.json")
-with open(GOOGLE_SERVICE_FILE, "r", encoding="utf-8") as f:GOOGLE_SERVICE_JSON = json.load(f)   
 MFJ_TRACKER_SHEET_ID = os.getenv('MFJ_TRACKER_SHEET_ID')
 DDTRACE_API_KEY = os.getenv('DDTRACE_API_KEY')
 AWS_S3_BUCKET_NAME = os.getenv('AWS_S3_BUCKET_NAME')
@@ -19,4 +18,61 @@ EC2_RESUME_PROCESS_ENDPOINT = os.getenv('EC2_RESUME_PROCESS_ENDPOINT')
 MONGO_DB_HOST = os.getenv('MONGO_DB_HOST')
 MONGO_DB_NAME = os.getenv('MONGO_DB_NAME')
 MONGO_DB_COLLECTION = os.getenv('MONGO_DB_COLLECTION')
-RESUME_PARSER_URL = os.getenv('RESUME_PARSER_URL')
\ No newline at end of file
+RESUME_PARSER_URL = os.getenv('RESUME_PARSER_URL')
+SCRAPER_WORKERS = int(os.getenv('SCRAPER_WORKERS', '1'))
+SCRAPER_WORKER_STAGGER = float(os.getenv('SCRAPER_WORKER_STAGGER', '5'))
+SCRAPER_JOB_MAX_ATTEMPTS = int(os.getenv('SCRAPER_JOB_MAX_ATTEMPTS', '3'))
+CV_FETCH_ENABLED = os.getenv('CV_FETCH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CV_FETCH_CONCURRENCY = int(os.getenv('CV_FETCH_CONCURRENCY', '8'))
+MFJ_APPLICANTS_API_PATTERN = os.getenv('MFJ_APPLICANTS_API_PATTERN', r'applicant')
+MFJ_MATCHES_API_PATTERN = os.getenv('MFJ_MATCHES_API_PATTERN', r'match')
+LEAN_PROFILE = os.getenv('LEAN_PROFILE', 'true').lower() in ('1', 'true', 'yes')
+LEAN_BLOCK_RESOURCE_TYPES = {t.strip() for t in os.getenv('LEAN_BLOCK_RESOURCE_TYPES', 'image,media').split(',') if t.strip()}
+LEAN_ALLOW_URLS = [u.strip() for u in os.getenv('LEAN_ALLOW_URLS', '').split(',') if u.strip()]
+SLOW_MO = int(os.getenv('SLOW_MO', '0'))
+THROTTLE_BASE_DELAY = float(os.getenv('THROTTLE_BASE_DELAY', '1.0'))
+THROTTLE_MIN_DELAY = float(os.getenv('THROTTLE_MIN_DELAY', '0.2'))
+THROTTLE_MAX_DELAY = float(os.getenv('THROTTLE_MAX_DELAY', '15'))
+MFJ_SEARCH_API_PATTERN = os.getenv('MFJ_SEARCH_API_PATTERN', r'vacanc|search')
+SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', '240'))
+TRACKER_BACKEND = os.getenv('TRACKER_BACKEND', 'sqlite').lower()
+TRACKER_CHECKPOINT_INTERVAL = float(os.getenv('TRACKER_CHECKPOINT_INTERVAL', '5'))
+
+STREAMING_UPLOAD = os.getenv('STREAMING_UPLOAD', 'true').lower() in ('1', 'true', 'yes')
+UPLOAD_QUEUE_SIZE = int(os.getenv('UPLOAD_QUEUE_SIZE', '64'))
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '2'))
+S3_UPLOAD_CONCURRENCY = int(os.getenv('S3_UPLOAD_CONCURRENCY', '16'))
+S3_UPLOAD_RETRIES = int(os.getenv('S3_UPLOAD_RETRIES', '3'))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv('S3_MULTIPART_THRESHOLD_MB', '8'))
+ZERO_DISK_UPLOAD = os.getenv('ZERO_DISK_UPLOAD', 'false').lower() in ('1', 'true', 'yes')
+UPLOAD_MEMORY_BUDGET_MB = int(os.getenv('UPLOAD_MEMORY_BUDGET_MB', '64'))
+UPLOAD_SPILL_THRESHOLD_MB = int(os.getenv('UPLOAD_SPILL_THRESHOLD_MB', '2'))
+PROCESS_CHUNK_SIZE = int(os.getenv('PROCESS_CHUNK_SIZE', '100'))
+PROCESS_CONCURRENCY = int(os.getenv('PROCESS_CONCURRENCY', '4'))
+PROCESS_RETRIES = int(os.getenv('PROCESS_RETRIES', '3'))
+PROCESS_TIMEOUT = float(os.getenv('PROCESS_TIMEOUT', '120'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '10'))
+OUTBOX_SPAWN_DRAINER = os.getenv('OUTBOX_SPAWN_DRAINER', 'true').lower() in ('1', 'true', 'yes')
+SHEET_FLUSH_EVERY = int(os.getenv('SHEET_FLUSH_EVERY', '20'))
+SHEET_FLUSH_INTERVAL = float(os.getenv('SHEET_FLUSH_INTERVAL', '60'))
+SHEET_PAGE_ROWS = int(os.getenv('SHEET_PAGE_ROWS', '1000'))
+
+
+def _load_google_service_json():
+    with open(GOOGLE_SERVICE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Settings that read files are resolved on first access, so commands that
+# never talk to Google don't need (or parse) the credentials
+_LAZY_SETTINGS = {
+    'GOOGLE_SERVICE_JSON': _load_google_service_json,
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_SETTINGS:
+        value = _LAZY_SETTINGS[name]()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Deliver queued downstream calls (resume processing, resume parser) from the outbox.
+"""
+
+import argparse
+import time
+from datetime import datetime
+from services.outbox import Outbox, drain
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deliver pending outbox entries')
+    parser.add_argument('--loop', action='store_true',
+                       help='Keep running until nothing is left to retry')
+    parser.add_argument('--interval', type=int, default=60,
+                       help='Seconds between passes with --loop (default: 60)')
+    
+    args = parser.parse_args()
+    
+    outbox = Outbox()
+    while True:
+        result = drain(outbox)
+        counts = outbox.counts()
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Delivered: {result['delivered']}, failed this pass: {result['failed']}, "
+              f"still pending: {counts['pending']}, gave up: {counts['failed']}")
+        if not args.loop or not counts['pending']:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
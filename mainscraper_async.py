@@ -0,0 +1,111 @@
+from services.playwright_async import login_to_portal, ensure_logged_in, process_job, is_logged_in
+from services.playwright import report_and_process_uploads, tracker
+from services.uploader import uploader
+from services.browser_profile import new_scraping_context_async, profile_stats
+from services.harvest import fingerprint_stats
+from services.throttle import throttle
+from services.session import load_storage_state
+from services import google_service
+from playwright.async_api import async_playwright
+from config.settings import SCRAPER_WORKERS, SCRAPER_JOB_MAX_ATTEMPTS, SLOW_MO
+import asyncio
+import os
+import shutil
+
+
+async def run_worker(worker_id, browser, jobs, gs, attempts):
+    """
+    Drive browser contexts through jobs from the shared queue. A failed job goes back
+    on the queue (up to SCRAPER_JOB_MAX_ATTEMPTS tries) and the worker carries on in a fresh context.
+    """
+    context = page = None
+    try:
+        while True:
+            try:
+                current = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+            i, sheet_job = current
+            job = sheet_job["job"]
+            try:
+                if page is None:
+                    context = await new_scraping_context_async(browser, storage_state=load_storage_state())
+                    page = await context.new_page()
+                    await ensure_logged_in(page)
+                if not tracker.claim_resume_state(job, worker_id):
+                    tracker.set_resume_state(i, job, "", 1, 0, worker=worker_id)
+                if not await is_logged_in(page):
+                    print(f"[worker {worker_id}] Session expired, logging in again")
+                    await login_to_portal(page)
+                # only a job whose every CV was stored is marked scraped; the rest are retried next run
+                if await process_job(page, sheet_job, i, tracker=tracker, worker=worker_id):
+                    # Queued and written in batches; a due flush runs off the event loop
+                    await asyncio.to_thread(gs.writetotrackersheet, jobid=sheet_job["id"])
+                else:
+                    print(f"[worker {worker_id}] Job {i} not completed; leaving it unscraped")
+                tracker.clear_resume_state(worker=worker_id)
+                await asyncio.to_thread(tracker.save_tracker)
+            except Exception as e:
+                print(f"\n[worker {worker_id}] Job {i} failed: {e}")
+                try:
+                    await page.screenshot(path=f"error_screenshot_worker{worker_id}.png")
+                except Exception:
+                    pass
+                # Hand the job and its resume state back so a retry picks up where it failed, unless it keeps failing
+                tracker.release_resume_state(worker_id)
+                await asyncio.to_thread(tracker.save_tracker, force=True)
+                attempts[i] = attempts.get(i, 0) + 1
+                if attempts[i] < SCRAPER_JOB_MAX_ATTEMPTS:
+                    jobs.put_nowait(current)
+                else:
+                    print(f"[worker {worker_id}] Giving up on job {i} after {attempts[i]} failed attempts")
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                context = page = None
+    finally:
+        if context is not None:
+            await context.close()
+
+
+async def main():
+    gs = google_service.GoogleServices()
+    sheet_jobs = await asyncio.to_thread(gs.read_from_sheet)
+
+    jobs = asyncio.Queue()
+    for item in enumerate(sheet_jobs):
+        jobs.put_nowait(item)
+
+    workers = max(1, min(SCRAPER_WORKERS, len(sheet_jobs)))
+    attempts = {}
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False, slow_mo=SLOW_MO)
+        try:
+            await asyncio.gather(*(
+                run_worker(worker_id, browser, jobs, gs, attempts)
+                for worker_id in range(workers)
+            ))
+        finally:
+            await asyncio.to_thread(tracker.save_tracker, force=True)
+            await asyncio.to_thread(gs.flush)
+            await browser.close()
+    profile_stats.report()
+    throttle.report()
+    fingerprint_stats.report()
+
+    # CVs were uploaded while the workers scraped; wait for the tail of the queue
+    upload_results = await asyncio.to_thread(uploader.drain)
+    await asyncio.to_thread(report_and_process_uploads, upload_results)
+
+    # Keep tmp/ around if anything failed to upload so the next run can pick it up
+    if not any(result["total_failed"] for result in upload_results) and os.path.exists("tmp"):
+        shutil.rmtree("tmp")
+        print("Temporary files cleaned up.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,8 +4,6 @@ Process previously uploaded resumes from S3.
 """
 
 import argparse
-from services.ec2endpoint import mfjendpoint
-from services.tracker import ScrapingTracker
 
 
 def main():
@@ -16,21 +14,51 @@ def main():
                        help='Specific job title to process')
     parser.add_argument('--list-jobs', action='store_true',
                        help='List available jobs')
+    parser.add_argument('--from-index', action='store_true',
+                       help='With --list-jobs, list jobs uploaded by every runner from the S3 index')
+    parser.add_argument('--verify', action='store_true',
+                       help='Reconcile the upload manifest with the bucket listing and exit')
+    parser.add_argument('--date', type=str,
+                       help='Day (YYYY-MM-DD) to verify (default: today)')
+    parser.add_argument('--force', action='store_true',
+                       help='Resend resumes the processing service already accepted')
     
     args = parser.parse_args()
     
-    endpoint = mfjendpoint()
-    tracker = ScrapingTracker()
+    # services are imported per command, so each one only loads what it uses
+    if args.verify:
+        from services.aws import S3Services
+        report = S3Services().verify_manifest(date=args.date)
+        print(f"Manifest {report['date']}: {report['recorded']} recorded, {report['listed']} in bucket")
+        for key in report['missing']:
+            print(f"  missing from bucket (will re-upload): {key}")
+        for key in report['mismatched']:
+            print(f"  size mismatch (will re-upload): {key}")
+        for key in report['untracked']:
+            print(f"  not in manifest: {key}")
+        return
     
     if args.list_jobs:
-        for job_name in tracker.data["jobs"].keys():
+        if args.from_index:
+            from services.aws import S3Services
+            from services.s3_index import window_days
+            # titles of the jobs with uploads in the window, from the S3 index (covers every runner)
+            jobs = S3Services().index.job_titles(window_days(args.hours))
+        else:
+            from services.tracker import ScrapingTracker
+            # this machine's jobs, without touching S3
+            jobs = ScrapingTracker().data["jobs"].keys()
+        for job_name in jobs:
             print(job_name)
         return
     
+    from services.ec2endpoint import mfjendpoint
+    endpoint = mfjendpoint()
+    
     if args.job:
-        result = endpoint.process_specific_job_resumes(args.job)
+        result = endpoint.process_specific_job_resumes(args.job, force=args.force)
     else:
-        result = endpoint.process_recent_resumes(hours_back=args.hours)
+        result = endpoint.process_recent_resumes(hours_back=args.hours, force=args.force)
     
     print(f"Processed: {result.get('processed_count', 0)} resumes")
     if result.get('message'):
@@ -1,12 +1,19 @@
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
 from config.settings import AWS_S3_BUCKET_NAME, AWS_S3_REGION,AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY
+from config.settings import S3_UPLOAD_CONCURRENCY, S3_UPLOAD_RETRIES, S3_MULTIPART_THRESHOLD_MB
+from services.cv_store import get_cv_store, clean_job_title
+from services.s3_index import S3DailyIndex
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
+import json
 import os
+import random
+import threading
+import time
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 LOCAL_DOWNLOADS_DIR = BASE_DIR / "tmp"
+MANIFEST_NAME = "manifest.json"
 
 
 def ensure_local_directory(path: str | Path) -> Path:
@@ -47,84 +54,271 @@ class S3Services:
         bucket_name: str | None = None,
         access_key_id: str | None = None,
         secret_access_key: str | None = None,
+        concurrency: int = S3_UPLOAD_CONCURRENCY,
+        retries: int = S3_UPLOAD_RETRIES,
     ):
+        # boto3 takes a noticeable part of a second to import; only load it for a client
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
         self.s3 = client or boto3.client(
             "s3",
             region_name=region or AWS_S3_REGION,
             aws_access_key_id=access_key_id or AWS_ACCESS_KEY_ID,
             aws_secret_access_key=secret_access_key or AWS_SECRET_ACCESS_KEY,
+            # one pooled connection per upload thread, plus headroom for multipart parts
+            config=Config(max_pool_connections=self.concurrency * 2, retries={"mode": "adaptive"}),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+            multipart_chunksize=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+            max_concurrency=4,
+            use_threads=True,
         )
         self.bucket_name = bucket_name or AWS_S3_BUCKET_NAME
+        self.index = S3DailyIndex(self.s3, self.bucket_name)
+        self._content_locks = {}
+        self._locks_guard = threading.Lock()
 
     def upload_to_s3(self, file_name: str | Path, bucket: str | None = None, object_name: str | None = None) -> bool:
         key = object_name or Path(file_name).name
-        self.s3.upload_file(str(file_name), bucket or self.bucket_name, key)
+        self.s3.upload_file(str(file_name), bucket or self.bucket_name, key, Config=self.transfer_config)
         return True
 
-    def upload_job_files_to_s3(self, job_title: str, bucket_name: str | None = None) -> dict:
-        bucket = bucket_name or self.bucket_name
-        today = datetime.now().strftime("%Y-%m-%d")
-        clean_job_title = "".join(c for c in job_title if c.isalnum() or c in (" ", "_", "-")).rstrip()
-        local_job_folder = LOCAL_DOWNLOADS_DIR / clean_job_title
+    def _with_retry(self, action: str, fn, *args, **kwargs):
+        """Call fn, retrying S3/network errors with exponential backoff and jitter."""
+        from botocore.exceptions import BotoCoreError, ClientError
+        for attempt in range(self.retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except FileNotFoundError:
+                raise
+            except (BotoCoreError, ClientError, OSError) as e:
+                if attempt == self.retries:
+                    raise
+                delay = min(30, 2 ** attempt) * (0.5 + random.random())
+                print(f"    WARN: {action} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
 
-        results = {
+    @staticmethod
+    def _new_result(job_title: str, today: str) -> dict:
+        return {
             "job_title": job_title,
             "date": today,
             "uploaded_files": [],
             "upload_folders":[],
             "uploaded_at": [],
             "total_uploaded": 0,
+            "total_skipped": 0,
             "total_failed": 0,
         }
 
-        if not local_job_folder.exists():
-            return results
+    @staticmethod
+    def _adopt_local_files(job_folder: str) -> None:
+        """PDFs dropped into tmp/<job>/<section>/ by hand are adopted into the CV store."""
+        for section in ("applicants", "possible_matches"):
+            section_path = LOCAL_DOWNLOADS_DIR / job_folder / section
+            if section_path.exists():
+                for file_path in section_path.glob("*.pdf"):
+                    get_cv_store().add(str(file_path), job_folder, section, file_path.name)
 
-        applicants_folder = local_job_folder / "applicants"
-        if applicants_folder.exists():
-            uploaded_files = self._upload_section_files(
-                applicants_folder,
-                f"{today}/{clean_job_title}/applicants/",
-                bucket,
-            )
-            results["upload_folders"].append(f"{today}/{clean_job_title}/applicants/")
-            results["total_uploaded"] += len(uploaded_files)
-
-        possible_matches_folder = local_job_folder / "possible_matches"
-        if possible_matches_folder.exists():
-            uploaded_files = self._upload_section_files(
-                possible_matches_folder,
-                f"{today}/{clean_job_title}/possible_matches/",
-                bucket,
-            )
-            results["upload_folders"].append(f"{today}/{clean_job_title}/possible_matches/")
-            results["total_uploaded"] += len(uploaded_files)
-
-        return results
-
-    def _upload_section_files(self, local_folder: Path, s3_prefix: str, bucket: str) -> list[dict]:
-        uploaded: list[dict] = []
-        for file_path in local_folder.glob("*.pdf"):
-            s3_key = f"{s3_prefix}{file_path.name}"
-            self.s3.upload_file(str(file_path), bucket, s3_key)
-            uploaded.append(
-                {"local_path": str(file_path), "s3_key": s3_key, "file_name": file_path.name}
+    def upload_job_files_to_s3(self, job_title: str, bucket_name: str | None = None) -> dict:
+        bucket = bucket_name or self.bucket_name
+        today = datetime.now().strftime("%Y-%m-%d")
+        job_folder = clean_job_title(job_title)
+
+        results = {job_folder: self._new_result(job_title, today)}
+        self._adopt_local_files(job_folder)
+        self._upload_refs({job_folder: get_cv_store().pending_refs(job_folder)}, results, bucket, today)
+        self.write_manifests([job_folder], bucket, today)
+        self.index.flush()
+        return results[job_folder]
+
+    def _manifest_key(self, job_folder: str, today: str) -> str:
+        return f"{today}/{job_folder}/{MANIFEST_NAME}"
+
+    def _load_remote_manifest(self, job_folder: str, bucket: str, today: str) -> None:
+        """Seed the local manifest from S3 when this machine has no record of the job's uploads."""
+        from botocore.exceptions import ClientError
+        store = get_cv_store()
+        if store.manifest_entries(f"{today}/{job_folder}/"):
+            return
+        try:
+            body = self.s3.get_object(Bucket=bucket, Key=self._manifest_key(job_folder, today))["Body"].read()
+            store.import_manifest(json.loads(body).get("objects", {}))
+        except ClientError:
+            pass
+        except ValueError as e:
+            print(f"WARN: unreadable S3 manifest for {job_folder}: {e}")
+
+    def write_manifests(self, job_folders: list[str], bucket_name: str | None = None, today: str | None = None) -> None:
+        """Write each job's S3-side manifest (key, size and sha256 of every object uploaded today)."""
+        from botocore.exceptions import BotoCoreError, ClientError
+        bucket = bucket_name or self.bucket_name
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        for job_folder in job_folders:
+            objects = get_cv_store().manifest_entries(f"{today}/{job_folder}/")
+            if not objects:
+                continue
+            try:
+                self._with_retry(
+                    f"manifest for {job_folder}", self.s3.put_object,
+                    Bucket=bucket, Key=self._manifest_key(job_folder, today), ContentType="application/json",
+                    Body=json.dumps({"job_folder": job_folder, "date": today, "objects": objects}, indent=2).encode("utf-8"),
+                )
+            except (BotoCoreError, ClientError) as e:
+                print(f"WARN: could not write the S3 manifest for {job_folder}: {e}")
+
+    def _upload_content(self, sha256: str, bucket: str, key: str, fileobj=None) -> tuple[str, bool]:
+        """
+        Make sure S3 holds a CV's content. The first time, it is uploaded straight to
+        `key`, which becomes the content's canonical key. Returns (canonical key,
+        uploaded now). Uploads from `fileobj` when the CV is held in memory, otherwise
+        from the local store; the local copy is deleted once S3 has it.
+        """
+        with self._locks_guard:
+            lock = self._content_locks.setdefault(sha256, threading.Lock())
+        store = get_cv_store()
+        with lock:
+            canonical = store.uploaded_key(sha256)
+            if canonical:
+                return canonical, False
+            local_path = store.local_path(sha256)
+            extra_args = {"ContentType": "application/pdf", "Metadata": {"sha256": sha256}}
+            if fileobj is not None:
+                self._with_retry(f"upload of {key}", self._upload_fileobj, fileobj, bucket, key, extra_args)
+            else:
+                self._with_retry(
+                    f"upload of {key}", self.s3.upload_file, local_path, bucket, key,
+                    ExtraArgs=extra_args, Config=self.transfer_config,
+                )
+            store.mark_uploaded(sha256, key)
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            return key, True
+
+    def _upload_fileobj(self, fileobj, bucket: str, key: str, extra_args: dict) -> None:
+        fileobj.seek(0)  # rewind on every attempt
+        self.s3.upload_fileobj(fileobj, bucket, key, ExtraArgs=extra_args, Config=self.transfer_config)
+
+    def upload_ref(self, job_folder: str, section: str, file_name: str, sha256: str,
+                   bucket: str | None = None, s3_prefix: str | None = None, fileobj=None) -> dict:
+        """Attach one stored CV to its job section in S3: uploaded there if S3 doesn't have the content yet, else copied."""
+        bucket = bucket or self.bucket_name
+        s3_prefix = s3_prefix or f"{datetime.now().strftime('%Y-%m-%d')}/{job_folder}/{section}/"
+        s3_key = f"{s3_prefix}{file_name}"
+        store = get_cv_store()
+
+        entry = store.manifest_entry(s3_key)
+        if entry and entry[0] == sha256:
+            # already in S3 with this content
+            store.mark_ref_uploaded(job_folder, section, file_name, s3_key)
+            return {"s3_key": s3_key, "file_name": file_name, "sha256": sha256, "skipped": True}
+
+        source_key, uploaded = self._upload_content(sha256, bucket, s3_key, fileobj)
+        etag = None
+        if not uploaded and source_key != s3_key:
+            # the same CV under another job or section: a server-side copy, no upload
+            response = self._with_retry(
+                f"copy to {s3_key}", self.s3.copy_object,
+                Bucket=bucket, Key=s3_key, CopySource={"Bucket": bucket, "Key": source_key},
             )
-        return uploaded
+            etag = response.get("CopyObjectResult", {}).get("ETag")
+        store.mark_ref_uploaded(job_folder, section, file_name, s3_key)
+        store.record_upload(s3_key, sha256, store.blob_size(sha256), etag)
+        if bucket == self.bucket_name:
+            self.index.add(s3_key, sha256, store.blob_size(sha256), store.job_title(job_folder))
+        return {"s3_key": s3_key, "file_name": file_name, "sha256": sha256}
+
+    def _upload_refs(self, refs_by_job: dict, results: dict, bucket: str, today: str) -> None:
+        """
+        Attach stored CVs to their job sections in S3, `concurrency` at a time.
+        The content is uploaded once, to the first key that needs it; every other
+        job/section key is a server-side copy of that one, so duplicates cost no upload. Fills in the per-job results, failures included.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="s3-upload") as pool:
+            futures = {}
+            for job_folder, refs in refs_by_job.items():
+                if refs:
+                    self._load_remote_manifest(job_folder, bucket, today)
+                for section, file_name, sha256 in refs:
+                    s3_prefix = f"{today}/{job_folder}/{section}/"
+                    future = pool.submit(self.upload_ref, job_folder, section, file_name, sha256, bucket, s3_prefix)
+                    futures[future] = (job_folder, s3_prefix, file_name)
+
+            for future in as_completed(futures):
+                job_folder, s3_prefix, file_name = futures[future]
+                result = results[job_folder]
+                try:
+                    uploaded = future.result()
+                except Exception as e:
+                    print(f"ERROR: upload of {job_folder}/{file_name} failed: {e}")
+                    result["total_failed"] += 1
+                    continue
+                if uploaded.get("skipped"):
+                    result["total_skipped"] += 1
+                    continue
+                if s3_prefix not in result["upload_folders"]:
+                    result["upload_folders"].append(s3_prefix)
+                result["uploaded_files"].append(uploaded)
+                result["uploaded_at"].append(datetime.now().isoformat())
+                result["total_uploaded"] += 1
 
     def upload_all_tmp_files_to_s3(self, bucket_name: str | None = None) -> list[dict]:
         bucket = bucket_name or self.bucket_name
-        all_results: list[dict] = []
-        if not LOCAL_DOWNLOADS_DIR.exists():
-            return all_results
-        for job_folder in LOCAL_DOWNLOADS_DIR.iterdir():
-            if job_folder.is_dir():
-                result = self.upload_job_files_to_s3(job_folder.name, bucket)
-                all_results.append(result)
-                
-        return all_results
+        today = datetime.now().strftime("%Y-%m-%d")
+        if LOCAL_DOWNLOADS_DIR.exists():
+            for job_folder in LOCAL_DOWNLOADS_DIR.iterdir():
+                if job_folder.is_dir() and not job_folder.name.startswith("."):
+                    self._adopt_local_files(job_folder.name)
+
+        # every job's files go through one pool rather than job after job
+        store = get_cv_store()
+        refs_by_job = {job_folder: store.pending_refs(job_folder) for job_folder in sorted(store.pending_job_folders())}
+        results = {job_folder: self._new_result(job_folder, today) for job_folder in refs_by_job}
+        self._upload_refs(refs_by_job, results, bucket, today)
+        self.write_manifests(list(results), bucket, today)
+        self.index.flush()
+        return list(results.values())
+
+    def verify_manifest(self, date: str | None = None, bucket_name: str | None = None) -> dict:
+        """
+        Reconcile the local manifest with a listing of the bucket for one day.
+        Entries whose object is gone (or has a different size) are dropped, so the
+        next upload sends them again; objects the manifest doesn't know are reported.
+        """
+        bucket = bucket_name or self.bucket_name
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        listed = {}
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"{date}/"):
+            for obj in page.get("Contents", []):
+                if not obj["Key"].endswith(f"/{MANIFEST_NAME}"):
+                    listed[obj["Key"]] = obj["Size"]
+
+        store = get_cv_store()
+        recorded = store.manifest_entries(f"{date}/")
+        missing = [key for key in recorded if key not in listed]
+        mismatched = [key for key, entry in recorded.items()
+                      if key in listed and entry["size"] is not None and entry["size"] != listed[key]]
+        untracked = [key for key in listed if key not in recorded]
+        for key in missing + mismatched:
+            store.forget_upload(key)
+
+        self.write_manifests(sorted({key.split("/")[1] for key in recorded}), bucket, date)
+        return {
+            "date": date,
+            "recorded": len(recorded),
+            "listed": len(listed),
+            "missing": missing,
+            "mismatched": mismatched,
+            "untracked": untracked,
+        }
 
     def retrieve_s3_url(self, object_name: str, bucket: str | None = None, expiration: int = 3600) -> str | None:
+        from botocore.exceptions import BotoCoreError, ClientError
         try:
             url = self.s3.generate_presigned_url(
                 "get_object",
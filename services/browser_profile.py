@@ -0,0 +1,174 @@
+from config.settings import LEAN_PROFILE, LEAN_BLOCK_RESOURCE_TYPES, LEAN_ALLOW_URLS
+from urllib.parse import urlparse
+import json
+import os
+import threading
+import time
+
+STATS_FILE = os.path.join("data", "lean_profile_stats.json")
+
+# Third-party analytics / ad hosts the scraper never needs
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "facebook.net",
+    "facebook.com",
+    "connect.facebook.net",
+    "hotjar.com",
+    "hotjar.io",
+    "clarity.ms",
+    "mixpanel.com",
+    "segment.io",
+    "newrelic.com",
+    "nr-data.net",
+    "linkedin.com",
+    "ads-twitter.com",
+    "tiktok.com",
+)
+
+
+def _host_matches(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class ProfileStats:
+    """
+    Per-run request metrics for scraping contexts: requests blocked by type, bytes
+    loaded (summed from the content-length of responses that sent one) and
+    page-load times. Each run's numbers are appended to data/lean_profile_stats.json.
+    """
+
+    def __init__(self, stats_file=STATS_FILE):
+        self.stats_file = stats_file
+        self.lock = threading.Lock()
+        self.blocked = {}
+        self.loaded_bytes = {}
+        self.loaded_count = {}
+        self.load_times = []
+        self._navigation_started = {}
+        self.history = self._load_history()
+
+    def _load_history(self):
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, "r") as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return {"runs": []}
+
+    def record_blocked(self, resource_type):
+        with self.lock:
+            self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+
+    def record_response(self, response):
+        # headers are delivered with the response event, so this never goes back to the browser
+        try:
+            length = response.headers.get("content-length")
+            resource_type = response.request.resource_type
+            size = int(length) if length is not None else None
+        except Exception:
+            return
+        with self.lock:
+            self.loaded_count[resource_type] = self.loaded_count.get(resource_type, 0) + 1
+            if size is not None:
+                self.loaded_bytes[resource_type] = self.loaded_bytes.get(resource_type, 0) + size
+
+    def record_navigation(self, page):
+        with self.lock:
+            self._navigation_started[page] = time.monotonic()
+
+    def record_load(self, page):
+        with self.lock:
+            started = self._navigation_started.pop(page, None)
+            if started is not None:
+                self.load_times.append(time.monotonic() - started)
+
+    def report(self):
+        """Print the run's numbers and append them to the stats file."""
+        with self.lock:
+            summary = {
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "lean_profile": LEAN_PROFILE,
+                "requests_loaded": sum(self.loaded_count.values()),
+                "bytes_loaded": sum(self.loaded_bytes.values()),
+                "requests_blocked": sum(self.blocked.values()),
+                "blocked_by_type": dict(self.blocked),
+                "page_loads": len(self.load_times),
+                "avg_page_load_seconds": round(sum(self.load_times) / len(self.load_times), 3) if self.load_times else None,
+            }
+            self.history.setdefault("runs", []).append(summary)
+            self.history["runs"] = self.history["runs"][-50:]
+
+            os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+            with open(self.stats_file, "w") as f:
+                json.dump(self.history, f, indent=2)
+
+        print(f"\n=== Browser Profile Summary ({'lean' if LEAN_PROFILE else 'full'}) ===")
+        print(f"Requests loaded: {summary['requests_loaded']} ({summary['bytes_loaded'] / 1024:.0f} KB with a content-length)")
+        print(f"Requests blocked: {summary['requests_blocked']} {summary['blocked_by_type']}")
+        if summary["avg_page_load_seconds"] is not None:
+            print(f"Page loads: {summary['page_loads']}, average {summary['avg_page_load_seconds']:.2f} seconds")
+        return summary
+
+
+profile_stats = ProfileStats()
+
+
+def should_block(url, resource_type):
+    """Decide whether the lean profile drops a request."""
+    if any(allowed in url for allowed in LEAN_ALLOW_URLS):
+        return False
+    host = urlparse(url).hostname or ""
+    if _host_matches(host, TRACKER_DOMAINS):
+        return True
+    return resource_type in LEAN_BLOCK_RESOURCE_TYPES
+
+
+def _on_request(request):
+    try:
+        if request.is_navigation_request() and request.frame.parent_frame is None:
+            profile_stats.record_navigation(request.frame.page)
+    except Exception:
+        pass
+
+
+def _attach_metrics(context):
+    context.on("response", profile_stats.record_response)
+    context.on("request", _on_request)
+    context.on("page", lambda page: page.on("load", profile_stats.record_load))
+
+
+def new_scraping_context(browser, lean=LEAN_PROFILE, **kwargs):
+    """Create a download-enabled browser context, with the lean resource profile applied if enabled."""
+    context = browser.new_context(accept_downloads=True, **kwargs)
+    _attach_metrics(context)
+    if lean:
+        def handle(route):
+            request = route.request
+            if should_block(request.url, request.resource_type):
+                profile_stats.record_blocked(request.resource_type)
+                route.abort()
+            else:
+                route.continue_()
+        context.route("**/*", handle)
+    return context
+
+
+async def new_scraping_context_async(browser, lean=LEAN_PROFILE, **kwargs):
+    """Async version of new_scraping_context."""
+    context = await browser.new_context(accept_downloads=True, **kwargs)
+    _attach_metrics(context)
+    if lean:
+        async def handle(route):
+            request = route.request
+            if should_block(request.url, request.resource_type):
+                profile_stats.record_blocked(request.resource_type)
+                await route.abort()
+            else:
+                await route.continue_()
+        await context.route("**/*", handle)
+    return context
@@ -0,0 +1,86 @@
+from config.settings import UPLOAD_MEMORY_BUDGET_MB, UPLOAD_SPILL_THRESHOLD_MB
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+MB = 1024 * 1024
+
+
+class MemoryBudget:
+    """Caps the bytes held in memory by CV buffers waiting for upload; callers block until there is room."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, nbytes):
+        nbytes = min(nbytes, self.max_bytes)
+        with self.condition:
+            while self.in_use + nbytes > self.max_bytes:
+                self.condition.wait()
+            self.in_use += nbytes
+        return nbytes
+
+    def release(self, nbytes):
+        with self.condition:
+            self.in_use -= nbytes
+            self.condition.notify_all()
+
+
+memory_budget = MemoryBudget(UPLOAD_MEMORY_BUDGET_MB * MB)
+
+
+class CvBuffer:
+    """
+    A downloaded CV held in memory for a direct upload, hashed as it is written.
+    Each buffer reserves the spill threshold from the shared memory budget; a CV
+    larger than the threshold spills to an anonymous temp file instead of growing
+    in memory. close() gives the reservation back.
+    """
+
+    def __init__(self, spill_threshold=UPLOAD_SPILL_THRESHOLD_MB * MB, budget=memory_budget):
+        self.budget = budget
+        self.reserved = budget.acquire(spill_threshold)
+        self.file = tempfile.SpooledTemporaryFile(max_size=spill_threshold)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.sha256 = None
+
+    @classmethod
+    def from_file(cls, path):
+        """Buffer a file the browser already wrote (Download.path()), skipping the save_as copy."""
+        buffer = cls()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                buffer.write(chunk)
+        return buffer.finish()
+
+    def write(self, chunk):
+        self.digest.update(chunk)
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def finish(self):
+        self.sha256 = self.digest.hexdigest()
+        self.file.seek(0)
+        return self
+
+    @property
+    def spilled(self):
+        return self.file._rolled
+
+    def spill_to(self, path):
+        """Write the content to disk, e.g. into the local store when an upload can't happen now."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(self.file, f)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.budget.release(self.reserved)
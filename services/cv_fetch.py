@@ -0,0 +1,161 @@
+from config.settings import CV_FETCH_CONCURRENCY
+from services.cv_buffer import CvBuffer
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import hashlib
+import re
+import requests
+
+# Collects id-like attribute values from a table row in one browser round-trip.
+# Keys describe where the value was found (tag, attribute, position) so the same
+# key points at the equivalent value on every row of the table.
+ROW_TOKENS_JS = """
+(row) => {
+    const tokens = {};
+    const pattern = /[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}|\\d{4,}/g;
+    const elements = [row, ...row.querySelectorAll('*')];
+    elements.forEach((el, elIndex) => {
+        for (const attr of el.attributes) {
+            const matches = attr.value.match(pattern) || [];
+            matches.forEach((value, n) => {
+                tokens[`${elIndex}:${el.tagName.toLowerCase()}[${attr.name}]#${n}`] = value;
+            });
+        }
+    });
+    return tokens;
+}
+"""
+# The same id shapes, for tokens taken from the table JSON instead of the DOM
+TOKEN_PATTERN = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}|\d{4,}")
+
+
+def id_tokens(flat):
+    """Id-like values of a flattened JSON row, keyed like ROW_TOKENS_JS keys its matches."""
+    tokens = {}
+    for key, value in flat.items():
+        for n, match in enumerate(TOKEN_PATTERN.findall(value)):
+            tokens[f"{key}#{n}"] = match
+    return tokens
+
+
+def _token_template(url, value):
+    """`url` with `value` replaced by {token}, if it appears there as a whole id rather than inside a longer one."""
+    match = re.search(r"(?<![0-9A-Za-z])%s(?![0-9A-Za-z])" % re.escape(value), url)
+    if not match:
+        return None
+    return url[:match.start()] + "{token}" + url[match.end():]
+
+
+class CvFetcher:
+    """
+    Fetches CVs straight over HTTP once the portal's CV download URL is known.
+
+    The first CVs in a section are still downloaded by clicking; their URLs are
+    matched against the rows' id-like attributes to learn a URL template, which is
+    proposed once two rows with different tokens agree on it and trusted once a
+    third row's download matches its prediction. Every later row
+    resolves to a URL from that template and is pulled with a pooled session that
+    carries the browser context's cookies, several at a time.
+    """
+
+    def __init__(self, cookies, user_agent=None, concurrency=CV_FETCH_CONCURRENCY):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+        self.set_cookies(cookies)
+
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="cv-fetch")
+        self.template = None
+        self.token_key = None
+        self.observed = {}
+        self.candidate = None
+
+    def set_cookies(self, cookies):
+        """Load cookies from Playwright's context.cookies() into the session."""
+        for cookie in cookies:
+            self.session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    def learn(self, download_url, row_tokens):
+        """
+        Derive the URL template from a clicked download and the tokens of the row it
+        came from. A token only counts where it makes up a whole id in the URL. A
+        candidate needs the previous click's row to give the same template through the
+        same token key with a different value, so a value every row shares (vacancy id,
+        page number) can't become the per-row token; it is then only trusted once the
+        next click's URL is exactly what the template predicts for that row.
+        """
+        if self.template or not download_url or not download_url.startswith("http"):
+            return False
+        if self.candidate:
+            key, template = self.candidate
+            self.candidate = None
+            token = row_tokens.get(key)
+            if token and template.replace("{token}", token) == download_url:
+                self.template = template
+                self.token_key = key
+                print(f"    Learned CV download URL pattern: {re.sub(r'[?].*', '?…', self.template)}")
+                return True
+        candidates = {}
+        for key, value in row_tokens.items():
+            template = _token_template(download_url, value)
+            if template:
+                candidates[key] = (template, value)
+        previous, self.observed = self.observed, candidates
+        for key, (template, value) in candidates.items():
+            if key in previous and previous[key][0] == template and previous[key][1] != value:
+                self.candidate = (key, template)
+                break
+        return False
+
+    def resolve(self, row_tokens):
+        """Return the direct CV URL for a row, or None if the fast path can't be used."""
+        if not self.template:
+            return None
+        token = row_tokens.get(self.token_key)
+        if not token:
+            return None
+        return self.template.replace("{token}", token)
+
+    def fetch(self, url, local_path=None, timeout=30):
+        """
+        Download a CV to local_path, hashing it on the way. Returns the sha256.
+        Without a local_path the CV is kept in memory and a CvBuffer is returned.
+        Raises if the portal didn't return a file.
+        """
+        with self.session.get(url, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "")
+            if "text/html" in content_type:
+                # An HTML answer is the login page or an error page, not a CV
+                raise ValueError(f"expected a file but got {content_type}")
+            if local_path is None:
+                buffer = CvBuffer()
+                try:
+                    for chunk in resp.iter_content(chunk_size=64 * 1024):
+                        buffer.write(chunk)
+                except Exception:
+                    buffer.close()
+                    raise
+                return buffer.finish()
+            digest = hashlib.sha256()
+            with open(local_path, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=64 * 1024):
+                    digest.update(chunk)
+                    f.write(chunk)
+        return digest.hexdigest()
+
+    def submit(self, url, local_path=None, then=None):
+        """
+        Queue a fetch in the background and return its Future. `then` is called with
+        the fetch result on the fetch thread, so in-memory CVs are handed on straight away.
+        """
+        if then is None:
+            return self.executor.submit(self.fetch, url, local_path)
+        return self.executor.submit(lambda: then(self.fetch(url, local_path)))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
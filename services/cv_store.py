@@ -0,0 +1,227 @@
+from datetime import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+
+CV_STORE_DB = os.path.join("data", "cv_store.db")
+LOCAL_CAS_DIR = os.path.join("tmp", ".cas")
+
+
+def clean_job_title(job_title):
+    """Job title as used for the tmp/ and S3 folder names."""
+    return "".join(c for c in job_title if c.isalnum() or c in (" ", "_", "-")).strip()
+
+
+def section_folder(section_name):
+    """Section name as used for the tmp/ and S3 folder names."""
+    return section_name.lower().replace(" ", "_")
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CvStore:
+    """
+    Content-addressed CV store.
+
+    Every saved CV is hashed and kept once locally, under tmp/.cas/<sha[:2]>/<sha>.pdf.
+    Jobs and sections hold references to the content (`refs`), so the same
+    jobseeker appearing under Applicants, Possible Matches and several vacancies
+    is stored and uploaded once: to the first job/section key that needs it,
+    which later references are server-side copies of.
+    The index lives in data/cv_store.db and survives between runs, together with
+    the upload manifest: key, size and hash of everything put in S3.
+    """
+
+    def __init__(self, db_file=CV_STORE_DB, cas_dir=LOCAL_CAS_DIR):
+        self.cas_dir = cas_dir
+        self.lock = threading.RLock()
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER,
+                    first_seen TEXT,
+                    s3_key TEXT
+                );
+                CREATE TABLE IF NOT EXISTS refs (
+                    job_folder TEXT,
+                    section_folder TEXT,
+                    filename TEXT,
+                    sha256 TEXT,
+                    job_title TEXT,
+                    added_at TEXT,
+                    s3_key TEXT,
+                    PRIMARY KEY (job_folder, section_folder, filename)
+                );
+                CREATE INDEX IF NOT EXISTS idx_refs_sha ON refs (sha256);
+                CREATE INDEX IF NOT EXISTS idx_refs_s3_key ON refs (s3_key);
+                CREATE TABLE IF NOT EXISTS manifest (
+                    s3_key TEXT PRIMARY KEY,
+                    sha256 TEXT,
+                    size INTEGER,
+                    etag TEXT,
+                    uploaded_at TEXT
+                );
+            """)
+
+    def local_path(self, sha256):
+        return os.path.join(self.cas_dir, sha256[:2], f"{sha256}.pdf")
+
+    def add(self, path, job_title, section_name, filename, sha256=None):
+        """
+        Take ownership of a freshly saved CV: move it into the local store (or drop it
+        if the same content is already stored) and reference it from the job section.
+        Returns (sha256, is_new_content).
+        """
+        sha256 = sha256 or hash_file(path)
+        with self.lock:
+            is_new = self.add_ref(job_title, section_name, filename, sha256, os.path.getsize(path))
+            if is_new:
+                target = self.local_path(sha256)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+            else:
+                os.remove(path)
+        return sha256, is_new
+
+    def add_ref(self, job_title, section_name, filename, sha256, size):
+        """
+        Reference content from a job section without handing over a file (the CV is
+        held in memory). True if neither S3 nor the local store has the content yet.
+        """
+        now = datetime.now().isoformat()
+        with self.lock:
+            row = self.conn.execute("SELECT s3_key FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            have_content = os.path.exists(self.local_path(sha256)) or (row is not None and row[0])
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO blobs (sha256, size, first_seen) VALUES (?, ?, ?)",
+                    (sha256, size, now),
+                )
+                # a reference re-added with the same content keeps its S3 key
+                self.conn.execute(
+                    "INSERT INTO refs (job_folder, section_folder, filename, sha256, job_title, added_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (job_folder, section_folder, filename) DO UPDATE SET "
+                    "s3_key = CASE WHEN refs.sha256 = excluded.sha256 THEN refs.s3_key END, "
+                    "sha256 = excluded.sha256, job_title = excluded.job_title, added_at = excluded.added_at",
+                    (clean_job_title(job_title), section_folder(section_name), filename, sha256, job_title, now),
+                )
+        return not have_content
+
+    def pending_refs(self, job_folder):
+        """References of a job not yet attached to an S3 key: [(section_folder, filename, sha256)]."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT section_folder, filename, sha256 FROM refs WHERE job_folder = ? AND s3_key IS NULL",
+                (job_folder,),
+            ).fetchall()
+
+    def pending_job_folders(self):
+        with self.lock:
+            return [r[0] for r in self.conn.execute("SELECT DISTINCT job_folder FROM refs WHERE s3_key IS NULL")]
+
+    def job_title(self, job_folder):
+        """The portal title a job folder was last saved under, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT job_title FROM refs WHERE job_folder = ? AND job_title IS NOT NULL ORDER BY added_at DESC LIMIT 1",
+                (job_folder,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def uploaded_key(self, sha256):
+        """The S3 key the content was first uploaded to, or None if it hasn't been uploaded yet."""
+        with self.lock:
+            row = self.conn.execute("SELECT s3_key FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def mark_uploaded(self, sha256, s3_key):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE blobs SET s3_key = ? WHERE sha256 = ?", (s3_key, sha256))
+
+    def mark_ref_uploaded(self, job_folder, section_folder, filename, s3_key):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE refs SET s3_key = ? WHERE job_folder = ? AND section_folder = ? AND filename = ?",
+                (s3_key, job_folder, section_folder, filename),
+            )
+
+    def sha_for_key(self, s3_key):
+        """Content hash behind an S3 key, if the manifest or a reference knows it."""
+        with self.lock:
+            row = (self.conn.execute("SELECT sha256 FROM manifest WHERE s3_key = ?", (s3_key,)).fetchone()
+                   or self.conn.execute("SELECT sha256 FROM refs WHERE s3_key = ?", (s3_key,)).fetchone())
+        return row[0] if row else None
+
+    def blob_size(self, sha256):
+        with self.lock:
+            row = self.conn.execute("SELECT size FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def record_upload(self, s3_key, sha256, size, etag=None):
+        """Add an object to the upload manifest."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?)",
+                (s3_key, sha256, size, etag, datetime.now().isoformat()),
+            )
+
+    def manifest_entry(self, s3_key):
+        """(sha256, size) recorded for an S3 key, or None."""
+        with self.lock:
+            return self.conn.execute("SELECT sha256, size FROM manifest WHERE s3_key = ?", (s3_key,)).fetchone()
+
+    def manifest_entries(self, prefix):
+        """{s3_key: {"sha256", "size"}} for every manifest entry under a prefix."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT s3_key, sha256, size FROM manifest WHERE substr(s3_key, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).fetchall()
+        return {key: {"sha256": sha256, "size": size} for key, sha256, size in rows}
+
+    def import_manifest(self, entries):
+        """Merge entries read from an S3-side manifest without overwriting local ones."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO manifest (s3_key, sha256, size, uploaded_at) VALUES (?, ?, ?, ?)",
+                [(key, entry.get("sha256"), entry.get("size"), entry.get("uploaded_at")) for key, entry in entries.items()],
+            )
+
+    def forget_upload(self, s3_key):
+        """Drop an object that is no longer in S3 so the next upload sends it again."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM manifest WHERE s3_key = ?", (s3_key,))
+            self.conn.execute("UPDATE refs SET s3_key = NULL WHERE s3_key = ?", (s3_key,))
+            self.conn.execute("UPDATE blobs SET s3_key = NULL WHERE s3_key = ?", (s3_key,))
+
+    def stats(self):
+        """Counts of distinct CVs vs. references, i.e. how much the store deduplicated."""
+        with self.lock:
+            blobs = self.conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+            refs = self.conn.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+        return {"unique_cvs": blobs, "references": refs, "duplicates": refs - blobs}
+
+
+_cv_store = None
+_cv_store_lock = threading.Lock()
+
+
+def get_cv_store():
+    """The run's CvStore; data/cv_store.db is opened on first use rather than at import."""
+    global _cv_store
+    with _cv_store_lock:
+        if _cv_store is None:
+            _cv_store = CvStore()
+        return _cv_store
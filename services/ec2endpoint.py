@@ -1,75 +1,257 @@
 from services.aws import S3Services
-from config.settings import EC2_RESUME_PROCESS_ENDPOINT
+from config.settings import EC2_RESUME_PROCESS_ENDPOINT, PROCESS_CHUNK_SIZE, PROCESS_CONCURRENCY, PROCESS_RETRIES, PROCESS_TIMEOUT
 from services.tracker import ScrapingTracker
+from services.cv_store import get_cv_store, clean_job_title
+from services.ledger import get_ledger, SUBMITTED, ACCEPTED, FAILED
+from services.s3_index import window_days
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+import random
 import requests
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
+from urllib.parse import unquote, urlparse
+
+LEDGER_ENDPOINT = "ec2_process"
 
 class mfjendpoint:
     def __init__(self):
         self.endpoint = EC2_RESUME_PROCESS_ENDPOINT
         self.s3_service = S3Services()
         self.tracker = ScrapingTracker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=PROCESS_CONCURRENCY, pool_maxsize=PROCESS_CONCURRENCY)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _post_chunk(self, s3_links: list[str]) -> dict:
+        """POST one chunk of links, retrying timeouts, connection errors, 429 and 5xx with backoff."""
+        for attempt in range(PROCESS_RETRIES + 1):
+            try:
+                resp = self.session.post(self.endpoint, json={"s3_urls": s3_links}, timeout=PROCESS_TIMEOUT)
+                if resp.status_code == 200:
+                    return resp.json()
+                error = Exception(f"Error {resp.status_code}: {resp.text}")
+                if resp.status_code != 429 and resp.status_code < 500:
+                    raise error
+            except requests.RequestException as e:
+                error = e
+            if attempt < PROCESS_RETRIES:
+                delay = min(60, 2 ** attempt) * (0.5 + random.random())
+                print(f"WARN: processing request failed ({error}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+        raise error
+
+    def _key_from_url(self, url: str) -> str:
+        """S3 key behind a presigned URL (virtual-hosted or path-style)."""
+        path = unquote(urlparse(url).path).lstrip("/")
+        bucket = self.s3_service.bucket_name
+        if bucket and path.startswith(bucket + "/"):
+            path = path[len(bucket) + 1:]
+        return path
+
+    def _submit_chunks(self, s3_keys: list, links: Optional[dict] = None, force: bool = False) -> dict:
+        """
+        Submit keys in PROCESS_CHUNK_SIZE chunks, up to PROCESS_CONCURRENCY at a time.
+        Keys the service already accepted (by key or content hash, see services.ledger)
+        are skipped unless `force`. `links` maps keys to ready-made URLs; other keys
+        are presigned right before their chunk is sent. A failed chunk doesn't fail
+        the others; per-chunk results are merged.
+        """
+        links = links or {}
+        ledger = get_ledger()
+        if force:
+            to_send, skipped = list(s3_keys), []
+        else:
+            to_send, skipped = ledger.filter_new(LEDGER_ENDPOINT, s3_keys)
+        chunks = [to_send[i:i + PROCESS_CHUNK_SIZE] for i in range(0, len(to_send), PROCESS_CHUNK_SIZE)]
+        merged = {"status": "ok", "chunks": [], "errors": [], "accepted": [], "skipped": skipped,
+                  "submitted_count": 0, "failed_count": 0}
+
+        def send(chunk):
+            """POST a chunk; returns (sent_keys, unsigned_keys, result). Keys that couldn't be presigned aren't sent."""
+            pairs = [(key, links.get(key) or self.s3_service.retrieve_s3_url(key)) for key in chunk]
+            sent = [key for key, url in pairs if url]
+            unsigned = [key for key, url in pairs if not url]
+            if unsigned:
+                ledger.record(LEDGER_ENDPOINT, unsigned, FAILED)
+            if not sent:
+                return sent, unsigned, None
+            ledger.record(LEDGER_ENDPOINT, sent, SUBMITTED)
+            try:
+                return sent, unsigned, self._post_chunk([url for _, url in pairs if url])
+            except Exception:
+                ledger.record(LEDGER_ENDPOINT, sent, FAILED)
+                raise
+
+        with ThreadPoolExecutor(max_workers=PROCESS_CONCURRENCY) as pool:
+            futures = {pool.submit(send, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    sent, unsigned, result = future.result()
+                except Exception as e:
+                    merged["errors"].append(str(e))
+                    merged["failed_count"] += len(chunk)
+                    continue
+                if unsigned:
+                    merged["errors"].append(f"could not presign {len(unsigned)} keys")
+                    merged["failed_count"] += len(unsigned)
+                if not sent:
+                    continue
+                ledger.record(LEDGER_ENDPOINT, sent, ACCEPTED)
+                merged["chunks"].append(result)
+                merged["accepted"].extend(sent)
+                merged["submitted_count"] += len(sent)
 
-    def s3linktoprocess(self, s3_links: list[str]) -> dict:
+        if merged["failed_count"]:
+            if not merged["submitted_count"]:
+                raise Exception("; ".join(merged["errors"]))
+            merged["status"] = "partial"
+        return merged
+
+    def s3linktoprocess(self, s3_links: list[str], force: bool = False) -> dict:
         """
         Send list of S3 links to the resume processing API.
+        Links to resumes the service already accepted are dropped unless `force`.
         """
-        payload = {"s3_urls": s3_links}
-        resp = requests.post(self.endpoint, json=payload)
+        links = {self._key_from_url(url): url for url in s3_links}
+        return self._submit_chunks(list(links), links, force)
 
-        if resp.status_code == 200:
-            return resp.json()
-        else:
-            raise Exception(f"Error {resp.status_code}: {resp.text}")
+    def submit_keys(self, s3_keys: list[str], force: bool = False) -> dict:
+        """
+        Like s3linktoprocess, but takes S3 keys and presigns each chunk just before
+        it is sent, so URLs can't expire while earlier chunks are in flight.
+        `accepted` in the result lists the keys the service took.
+        """
+        return self._submit_chunks(list(s3_keys), force=force)
 
     def get_recent_resumes_s3_links(self, hours_back: int = 24, job_title: Optional[str] = None) -> List[str]:
         """Get S3 presigned URLs for recently uploaded resumes."""
-        cutoff_time = datetime.now() - timedelta(hours=hours_back)
-        s3_links = []
-        today = datetime.now().strftime("%Y-%m-%d")
-        
+        links = []
+        for key, _ in self.get_recent_resume_objects(hours_back, job_title):
+            presigned_url = self.s3_service.retrieve_s3_url(key)
+            if presigned_url:
+                links.append(presigned_url)
+        return links
+
+    def _recent_job_folders(self, cutoff_time: datetime, job_title: Optional[str]) -> List[str]:
         if job_title:
-            job_titles_to_check = [job_title]
-        else:
-            job_titles_to_check = []
-            for job_name, job_info in self.tracker.data["jobs"].items():
-                if job_info.get("last_processed"):
-                    try:
-                        last_processed = datetime.fromisoformat(job_info["last_processed"])
-                        if last_processed >= cutoff_time:
-                            job_titles_to_check.append(job_name)
-                    except:
-                        continue
-        
-        for job_name in job_titles_to_check:
-            clean_job_name = "".join(c for c in job_name if c.isalnum() or c in (" ", "_", "-")).rstrip()
-            
-            for section in ["applicants", "possible_matches"]:
-                s3_prefix = f"{today}/{clean_job_name}/{section}/"
-                
+            return [clean_job_title(job_title)]
+        job_folders = []
+        for job_name, job_info in self.tracker.data["jobs"].items():
+            if not job_info.get("last_processed"):
+                continue
+            try:
+                last_processed = datetime.fromisoformat(job_info["last_processed"])
+            except (TypeError, ValueError):
+                continue
+            if last_processed >= cutoff_time:
+                job_folders.append(clean_job_title(job_name))
+        return job_folders
+
+    def _list_prefix(self, prefix: str, cutoff_utc: datetime) -> List[dict]:
+        """Every object under a prefix modified after the cutoff, across all result pages."""
+        paginator = self.s3_service.s3.get_paginator("list_objects_v2")
+        found = []
+        for page in paginator.paginate(Bucket=self.s3_service.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["LastModified"] >= cutoff_utc:
+                    found.append(obj)
+        return found
+
+    def _read_day_index(self, day: str, cutoff_utc: datetime, job_folder: Optional[str]) -> Optional[List[dict]]:
+        """A day's uploads after the cutoff from the S3 index, or None if the day has no index."""
+        entries = self.s3_service.index.read(day)
+        if entries is None:
+            return None
+        found = []
+        for entry in entries:
+            if job_folder and entry.get("job_folder") != job_folder:
+                continue
+            try:
+                uploaded_at = datetime.fromisoformat(entry["uploaded_at"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if uploaded_at >= cutoff_utc:
+                found.append({"Key": entry["key"], "LastModified": uploaded_at, "sha256": entry.get("sha256")})
+        return found
+
+    def get_recent_resume_objects(self, hours_back: int = 24, job_title: Optional[str] = None) -> List[tuple]:
+        """
+        (s3_key, sha256) of recently uploaded resumes, skipping content that already
+        appears earlier in the list. sha256 is None when neither the index nor the
+        local CV store knows the object.
+
+        Covers every YYYY-MM-DD partition the window touches. Each day is read
+        from its S3 index objects (index/<day>/, written by every runner);
+        days without one, and today (whose index can still be missing entries
+        a runner hasn't flushed yet), are also listed by the job prefixes from
+        the local tracker, in parallel and with paginators.
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+        now = datetime.now()
+        cutoff_time = now - timedelta(hours=hours_back)
+        cutoff_utc = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+        job_folder = clean_job_title(job_title) if job_title else None
+
+        days = window_days(hours_back, now)
+        today = now.strftime("%Y-%m-%d")
+
+        listed = []
+        listed_days = [today]
+        with ThreadPoolExecutor(max_workers=self.s3_service.concurrency) as pool:
+            futures = {pool.submit(self._read_day_index, day, cutoff_utc, job_folder): day for day in days}
+            for future in as_completed(futures):
                 try:
-                    response = self.s3_service.s3.list_objects_v2(
-                        Bucket=self.s3_service.bucket_name,
-                        Prefix=s3_prefix
-                    )
-                    
-                    if 'Contents' in response:
-                        for obj in response['Contents']:
-                            if obj['LastModified'].replace(tzinfo=None) >= cutoff_time:
-                                presigned_url = self.s3_service.retrieve_s3_url(obj['Key'])
-                                if presigned_url:
-                                    s3_links.append(presigned_url)
-                except:
-                    continue
-        
-        return s3_links
+                    found = future.result()
+                except (BotoCoreError, ClientError) as e:
+                    print(f"WARN: could not read the S3 index for {futures[future]}: {e}")
+                    found = None
+                if found is None:
+                    if futures[future] != today:
+                        listed_days.append(futures[future])
+                else:
+                    listed.extend(found)
+
+            prefixes = [
+                f"{day}/{folder}/{section}/"
+                for day in listed_days
+                for folder in self._recent_job_folders(cutoff_time, job_title)
+                for section in ("applicants", "possible_matches")
+            ]
+            futures = {pool.submit(self._list_prefix, prefix, cutoff_utc): prefix for prefix in prefixes}
+            for future in as_completed(futures):
+                try:
+                    listed.extend(future.result())
+                except (BotoCoreError, ClientError) as e:
+                    print(f"WARN: could not list s3://{self.s3_service.bucket_name}/{futures[future]}: {e}")
 
-    def process_recent_resumes(self, hours_back: int = 24, job_title: Optional[str] = None) -> Dict:
-        """Get recent resume S3 links and send them for processing."""
-        s3_links = self.get_recent_resumes_s3_links(hours_back, job_title)
+        # a key both indexed and listed keeps the index entry, which carries its hash
+        by_key = {}
+        for obj in listed:
+            if obj["Key"] not in by_key or obj.get("sha256"):
+                by_key[obj["Key"]] = obj
+
+        objects = []
+        seen = set()
+        for obj in sorted(by_key.values(), key=lambda o: (o["LastModified"], o["Key"])):
+            sha256 = obj.get("sha256") or get_cv_store().sha_for_key(obj["Key"])
+            if sha256 and sha256 in seen:
+                continue
+            seen.add(sha256)
+            objects.append((obj["Key"], sha256))
+        return objects
+
+    def process_recent_resumes(self, hours_back: int = 24, job_title: Optional[str] = None, force: bool = False) -> Dict:
+        """
+        Get recent resume S3 links and send them for processing.
+        Resumes the service already accepted are left out unless `force`.
+        """
+        objects = self.get_recent_resume_objects(hours_back, job_title)
         
-        if not s3_links:
+        if not objects:
             return {
                 "status": "no_files",
                 "message": f"No resumes found in the last {hours_back} hours",
@@ -77,8 +259,13 @@ class mfjendpoint:
             }
         
         try:
-            result = self.s3linktoprocess(s3_links)
-            result["processed_count"] = len(s3_links)
+            result = self.submit_keys([key for key, _ in objects], force=force)
+            result["processed_count"] = result["submitted_count"]
+            if not result["accepted"] and not result["errors"]:
+                result["status"] = "no_files"
+                result["message"] = f"All {len(objects)} resumes from the last {hours_back} hours were already processed"
+            if result["errors"]:
+                result["message"] = f"{result['failed_count']} resumes failed: " + "; ".join(result["errors"])
             return result
         except Exception as e:
             return {
@@ -87,6 +274,6 @@ class mfjendpoint:
                 "processed_count": 0
             }
 
-    def process_specific_job_resumes(self, job_title: str) -> Dict:
+    def process_specific_job_resumes(self, job_title: str, force: bool = False) -> Dict:
         """Process all resumes for a specific job title uploaded today."""
-        return self.process_recent_resumes(hours_back=24, job_title=job_title)
\ No newline at end of file
+        return self.process_recent_resumes(hours_back=24, job_title=job_title, force=force)
\ No newline at end of file
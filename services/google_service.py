@@ -1,11 +1,149 @@
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-import json
-from config.settings import GOOGLE_SERVICE_JSON,MFJ_TRACKER_SHEET_ID
-import re
+from config.settings import MFJ_TRACKER_SHEET_ID, SHEET_FLUSH_EVERY, SHEET_FLUSH_INTERVAL, SHEET_PAGE_ROWS
+import threading
+import time
+
+TRACKER_RANGE = "'ScraperUse'"
+
+
+def column_letter(index):
+    """A1 column name for a 0-based column index: 0 -> A, 25 -> Z, 26 -> AA."""
+    name = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+class SheetSession:
+    """
+    One read of a tracker sheet per run. Given a sheet name, the whole grid is
+    read (its size comes from the spreadsheet metadata) in pages of
+    SHEET_PAGE_ROWS rows; a full A1 range is read as-is. The header index and
+    the job id -> row map are built from that read; "scraped" flags are queued and written with a
+    single values().batchUpdate once SHEET_FLUSH_EVERY are waiting or
+    SHEET_FLUSH_INTERVAL seconds have passed, and on flush() at shutdown.
+    Safe to share between worker threads: API calls go one at a time.
+    """
+
+    def __init__(self, service, sheet_id, sheet_range, flush_every=SHEET_FLUSH_EVERY, flush_interval=SHEET_FLUSH_INTERVAL,
+                 page_rows=SHEET_PAGE_ROWS):
+        self.service = service
+        self.sheet_id = sheet_id
+        self.sheet_range = sheet_range
+        self.sheet_name = sheet_range.split("!")[0]
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.page_rows = page_rows
+        self.lock = threading.RLock()
+        self._values = None
+        self.header_index = {}
+        self.job_rows = {}
+        self.pending = {}
+        self.last_flush = time.monotonic()
+
+    def _get(self, cell_range):
+        result = self.service.sheets().spreadsheets().values().get(
+            spreadsheetId=self.sheet_id,
+            range=cell_range
+        ).execute()
+        return result.get("values", [])
+
+    def _grid_size(self):
+        """(rows, columns) of the sheet, from the spreadsheet metadata."""
+        title = self.sheet_name.strip("'").replace("''", "'")
+        metadata = self.service.sheets().spreadsheets().get(
+            spreadsheetId=self.sheet_id,
+            fields="sheets(properties(title,gridProperties(rowCount,columnCount)))"
+        ).execute()
+        for sheet in metadata.get("sheets", []):
+            properties = sheet.get("properties", {})
+            if properties.get("title") == title:
+                grid = properties.get("gridProperties", {})
+                return grid.get("rowCount", 0), grid.get("columnCount", 0)
+        raise RuntimeError(f"Sheet {title} not found in spreadsheet {self.sheet_id}")
+
+    def _read(self):
+        if "!" in self.sheet_range:
+            return self._get(self.sheet_range)
+        row_count, column_count = self._grid_size()
+        if not row_count or not column_count:
+            return []
+        last_column = column_letter(column_count - 1)
+        values = []
+        for start in range(1, row_count + 1, self.page_rows):
+            end = min(start + self.page_rows - 1, row_count)
+            page = self._get(f"{self.sheet_name}!A{start}:{last_column}{end}")
+            if page:
+                # the API leaves out empty rows at the end of a page
+                values.extend([] for _ in range(start - 1 - len(values)))
+                values.extend(page)
+        return values
+
+    def values(self):
+        """The sheet's cells, read on first use."""
+        with self.lock:
+            if self._values is None:
+                self._values = self._read()
+                if self._values:
+                    self.header_index = {h.strip().lower(): i for i, h in enumerate(self._values[0])}
+                    id_idx = self.header_index.get("ed job id")
+                    if id_idx is not None:
+                        # Rows start from 2 (1-based, after header)
+                        self.job_rows = {
+                            row[id_idx]: row_idx
+                            for row_idx, row in enumerate(self._values[1:], start=2)
+                            if len(row) > id_idx and row[id_idx]
+                        }
+            return self._values
+
+    def mark_scraped(self, jobid):
+        """Queue the 'scraped' flag for a job; written on the next flush."""
+        with self.lock:
+            if not self.values():
+                return
+            try:
+                self.header_index["ed job id"]
+                scraped_idx = self.header_index["scraped"]
+            except KeyError:
+                raise RuntimeError("Expected headers 'Ed job id' and 'scraped' not found.")
+            row_idx = self.job_rows.get(jobid)
+            if row_idx is None:
+                print(f"WARN: job id {jobid} not found in the tracker sheet")
+                return
+            self.pending[f"{self.sheet_name}!{column_letter(scraped_idx)}{row_idx}"] = jobid
+            due = (len(self.pending) >= self.flush_every
+                   or time.monotonic() - self.last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write every queued flag in one batchUpdate; failed writes stay queued."""
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+            try:
+                self.service.sheets().spreadsheets().values().batchUpdate(
+                    spreadsheetId=self.sheet_id,
+                    body={
+                        "valueInputOption": "RAW",
+                        "data": [{"range": cell, "values": [["Yes"]]} for cell in pending],
+                    }
+                ).execute()
+            except Exception as e:
+                print(f"WARN: could not update the tracker sheet ({len(pending)} jobs queued): {e}")
+                self.pending = dict(pending, **self.pending)
+                return
+            print(f"Updated scraped status to 'yes' for {len(pending)} jobs: {', '.join(map(str, pending.values()))}")
 
 class GoogleServices:
     def __init__(self):
+        # the Google client libraries are only loaded by code that talks to Sheets
+        from config.settings import GOOGLE_SERVICE_JSON
+        from google.oauth2 import service_account
+
         if not GOOGLE_SERVICE_JSON or not isinstance(GOOGLE_SERVICE_JSON, dict):
             raise ValueError("GOOGLE_SERVICE_JSON must be a valid dict")
 
@@ -14,21 +152,42 @@ class GoogleServices:
             scopes=["https://www.googleapis.com/auth/spreadsheets"]
         )
         self._sheets_service = None
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
         
     def sheets(self):
-        """Return the Google Sheets API client (lazy-loaded)."""
+        """
+        Return the Google Sheets API client (lazy-loaded). Built from the discovery
+        document bundled with googleapiclient instead of fetching it every run.
+        """
         if self._sheets_service is None:
-            self._sheets_service = build("sheets", "v4", credentials=self.credentials)
+            from googleapiclient.discovery import build
+
+            self._sheets_service = build("sheets", "v4", credentials=self.credentials,
+                                         static_discovery=True, cache_discovery=False)
         return self._sheets_service
 
-    
+    def session(self, sheet_id: str = MFJ_TRACKER_SHEET_ID, sheet_range: str = TRACKER_RANGE) -> SheetSession:
+        """The run's SheetSession for a sheet range, created on first use."""
+        with self._sessions_lock:
+            key = (sheet_id, sheet_range)
+            if key not in self._sessions:
+                self._sessions[key] = SheetSession(self, sheet_id, sheet_range)
+            return self._sessions[key]
+
+    def flush(self):
+        """Write queued sheet updates; call before exiting."""
+        for session in list(self._sessions.values()):
+            session.flush()
+
     def read_from_sheet(
         self,
         sheet_id: str = MFJ_TRACKER_SHEET_ID,
-        sheet_range: str = "'ScraperUse'!A1:Z1000",  
+        sheet_range: str = TRACKER_RANGE,
     ):
         """
-        Return Job published name for rows where 'Expired on MFJ' is NOT truthy.
+        Return Job published name, Ed job id and MFJ link for rows where
+        'Expired on MFJ' is NOT truthy.
         """
 
         def truthy(v: object) -> bool:
@@ -44,13 +203,7 @@ class GoogleServices:
 
             return url_string.strip().lower().startswith("https://")
 
-        service = self.sheets()
-        result = service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range=sheet_range
-        ).execute()
-
-        values = result.get("values", [])
+        values = self.session(sheet_id, sheet_range).values()
         if not values:
             return []
 
@@ -76,7 +229,7 @@ class GoogleServices:
             job_name = row[job_name_idx] if job_name_idx < len(row) else ""
             idx_val = row[idx] if idx < len(row) else ""
             if not truthy(expired_val) and job_name and is_https(mfj_link_val) and not truthy(scraped_idx_val):
-                jobs.append({"job":job_name,"id":idx_val})
+                jobs.append({"job":job_name,"id":idx_val,"link":mfj_link_val.strip()})
 
         return jobs
 
@@ -84,37 +237,10 @@ class GoogleServices:
         self,
         jobid,
         sheet_id: str = MFJ_TRACKER_SHEET_ID,
-        sheet_range: str = "'ScraperUse'!A1:Z1000",
+        sheet_range: str = TRACKER_RANGE,
     ):
-        """Update the 'scraped' status to 'yes' for the specified job."""
-        service = self.sheets()
-        result = service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range=sheet_range
-        ).execute()
-
-        values = result.get("values", [])
-        if not values:
-            return
-
-        headers = values[0]
-        header_index = {h.strip().lower(): i for i, h in enumerate(headers)}
-
-        try:
-            idx = header_index["ed job id"]
-            scraped_idx = header_index["scraped"]
-        except KeyError:
-            raise RuntimeError("Expected headers 'Job published name' and 'scraped' not found.")
-
-        for row_idx, row in enumerate(values[1:], start=2):  # Rows start from 2 (1-based, after header)
-            if len(row) > idx and row[idx] == jobid:
-                # Update the 'scraped' column for this row
-                update_range = f"'ScraperUse'!{chr(65 + scraped_idx)}{row_idx}"
-                update_result = service.spreadsheets().values().update(
-                    spreadsheetId=sheet_id,
-                    range=update_range,
-                    body={"values": [["Yes"]]},
-                    valueInputOption="RAW"
-                ).execute()
-                print(f"Updated scraped status to 'yes' for job: {idx}")
-                break
+        """
+        Set the 'scraped' status to 'yes' for the specified job. The write is
+        batched with others; call flush() before exiting.
+        """
+        self.session(sheet_id, sheet_range).mark_scraped(jobid)
@@ -0,0 +1,321 @@
+from config.settings import MFJ_APPLICANTS_API_PATTERN, MFJ_MATCHES_API_PATTERN
+from services.cv_fetch import ROW_TOKENS_JS, id_tokens
+import hashlib
+import re
+import threading
+import weakref
+
+SECTION_PATTERNS = {
+    "Possible Matches": re.compile(MFJ_MATCHES_API_PATTERN, re.IGNORECASE),
+    "Applicants": re.compile(MFJ_APPLICANTS_API_PATTERN, re.IGNORECASE),
+}
+
+NAME_SELECTORS = {
+    "Applicants": ['[data-test="swipe-table-cell--jobseekerName"] span'],
+    "Possible Matches": ['[data-test="swipe-table-cell--name"] span', 'span.add-ellipsis.cursor-pointer'],
+}
+
+# Reads the name, cell texts and id-like tokens of every row on the page in one round-trip
+ROWS_SNAPSHOT_JS = """
+(rows, nameSelectors) => {
+    const rowTokens = %s;
+    return rows.map(row => {
+        let name = null;
+        for (const selector of nameSelectors) {
+            const el = row.querySelector(selector);
+            const text = el ? (el.innerText || '').trim() : '';
+            if (text) { name = text; break; }
+        }
+        const cells = {};
+        row.querySelectorAll('[data-test^="swipe-table-cell--"]').forEach(cell => {
+            cells[cell.getAttribute('data-test').replace('swipe-table-cell--', '')] = (cell.innerText || '').trim();
+        });
+        return {name, cells, tokens: rowTokens(row)};
+    });
+}
+""" % ROW_TOKENS_JS.strip()
+
+LIST_KEYS = ("content", "data", "items", "results", "rows", "records", "list")
+TOTAL_KEYS = ("totalelements", "total", "totalcount", "totalitems", "totalrecords", "count")
+ID_KEYS = ("jobseekerid", "candidateid", "applicantid", "applicationid", "userid", "id")
+# too generic to trust below the row's top level (vacancy.id, employer.id, ...)
+TOP_LEVEL_ONLY_KEYS = ("id",)
+NAME_KEYS = ("jobseekername", "fullname", "candidatename", "applicantname", "name")
+DATE_KEYS = ("applieddate", "applicationdate", "appliedon", "applydate", "createddate", "createdat", "matcheddate")
+
+_harvesters = weakref.WeakKeyDictionary()
+
+
+def _flatten(value, prefix=""):
+    """Flatten nested JSON into {"a.b.0.c": "value"} with string leaves."""
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}{key}."))
+    elif isinstance(value, list):
+        for n, item in enumerate(value):
+            flat.update(_flatten(item, f"{prefix}{n}."))
+    elif value is not None:
+        flat[prefix.rstrip(".")] = str(value)
+    return flat
+
+
+def _pick(flat, keys):
+    """
+    First value whose (case-insensitive) leaf key is in keys, in keys order.
+    A leaf nearer the row's top level wins over a nested one with the same key;
+    TOP_LEVEL_ONLY_KEYS only match at the top level.
+    """
+    by_leaf = {}
+    for path, value in sorted(flat.items(), key=lambda item: item[0].count(".")):
+        leaf = path.rsplit(".", 1)[-1].lower()
+        if leaf in TOP_LEVEL_ONLY_KEYS and "." in path:
+            continue
+        by_leaf.setdefault(leaf, value)
+    for key in keys:
+        if by_leaf.get(key):
+            return by_leaf[key]
+    return None
+
+
+def _find_rows(body, depth=0):
+    """Find the list of row objects in a table response, plus the total count if present."""
+    if isinstance(body, list):
+        return (body, None) if body and all(isinstance(item, dict) for item in body) else (None, None)
+    if not isinstance(body, dict) or depth > 3:
+        return None, None
+
+    total = None
+    for key, value in body.items():
+        if key.lower() in TOTAL_KEYS and isinstance(value, int):
+            total = value
+            break
+
+    candidates = [body[k] for k in body if k.lower() in LIST_KEYS] + [v for k, v in body.items() if k.lower() not in LIST_KEYS]
+    for value in candidates:
+        rows, nested_total = _find_rows(value, depth + 1)
+        if rows is not None:
+            return rows, total if total is not None else nested_total
+    return None, total
+
+
+def extract_records(body):
+    """
+    Turn a table JSON response into row records:
+      {"id", "name", "applied_on", "tokens"}
+    `tokens` are the row's id-like values (as ROW_TOKENS_JS finds them in the DOM),
+    used by CvFetcher to resolve direct CV URLs.
+    Returns (records, total) or (None, None) if the body doesn't look like a table page.
+    """
+    rows, total = _find_rows(body)
+    if rows is None:
+        return None, None
+
+    records = []
+    for item in rows:
+        flat = _flatten(item)
+        name = _pick(flat, NAME_KEYS)
+        if not name:
+            first, last = _pick(flat, ("firstname",)), _pick(flat, ("lastname",))
+            name = " ".join(part for part in (first, last) if part) or None
+        records.append({
+            "id": _pick(flat, ID_KEYS),
+            "name": name,
+            "applied_on": _pick(flat, DATE_KEYS),
+            "tokens": id_tokens(flat),
+        })
+
+    # ids shared between rows aren't jobseeker ids; identify those rows by name and date instead
+    ids = [record["id"] for record in records if record["id"]]
+    if len(ids) != len(set(ids)):
+        for record in records:
+            record["id"] = None
+    return records, total
+
+
+def _name_words(name):
+    return sorted(re.findall(r"\w+", (name or "").lower()))
+
+
+def records_match_rows(records, snapshot):
+    """
+    True if JSON records line up with the rows on screen: same count and, row by row,
+    the same name (word order and punctuation aside). Client-side sorting or a late
+    response for another page would otherwise pin ids and tokens on the wrong rows.
+    """
+    if not records or len(records) != len(snapshot):
+        return False
+    for record, row in zip(records, snapshot):
+        words = _name_words(record.get("name"))
+        if not words or words != _name_words(row.get("name")):
+            return False
+    return True
+
+
+def row_identity(record):
+    """
+    Stable identity for an applicant row, usable before anything is downloaded:
+    the jobseeker id when the table JSON has one, otherwise the name plus the
+    application date column, otherwise the name alone. None if nothing usable.
+    """
+    if record.get("id"):
+        return f"id:{record['id']}"
+    name = " ".join((record.get("name") or "").lower().split())
+    if not name:
+        return None
+    applied_on = record.get("applied_on")
+    if not applied_on:
+        for cell, text in (record.get("cells") or {}).items():
+            if text and ("date" in cell.lower() or "applied" in cell.lower()):
+                applied_on = text
+                break
+    return f"name:{name}|date:{applied_on}" if applied_on else f"name:{name}"
+
+
+def identity_suffix(identity):
+    """Short, filename-safe fingerprint of a row identity."""
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()[:8]
+
+
+class TableHarvester:
+    """
+    Listens to a page's responses and keeps the latest JSON response behind each
+    applicant table. Handlers only store the Response; the body is parsed when the
+    scraper asks for a page so nothing blocks inside the event callback.
+    """
+
+    def __init__(self, page):
+        self.lock = threading.Lock()
+        self.responses = {}
+        self.sequence = {section: 0 for section in SECTION_PATTERNS}
+        self.consumed = {section: 0 for section in SECTION_PATTERNS}
+        self.totals = {}
+        page.on("response", self._on_response)
+
+    @classmethod
+    def for_page(cls, page):
+        """Return the harvester attached to a page, attaching one if needed."""
+        if page not in _harvesters:
+            _harvesters[page] = cls(page)
+        return _harvesters[page]
+
+    def reset(self):
+        """Forget the previous vacancy's responses and totals before opening another one."""
+        with self.lock:
+            self.responses.clear()
+            self.totals.clear()
+            self.consumed = dict(self.sequence)
+
+    def _on_response(self, response):
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        for section, pattern in SECTION_PATTERNS.items():
+            if pattern.search(response.url):
+                with self.lock:
+                    self.responses[section] = response
+                    self.sequence[section] += 1
+                return
+
+    def take_latest(self, section_name):
+        """Return the newest response for a section not handed out before, or None."""
+        with self.lock:
+            if self.sequence[section_name] == self.consumed[section_name]:
+                return None
+            self.consumed[section_name] = self.sequence[section_name]
+            return self.responses.get(section_name)
+
+    def records_from_body(self, section_name, body, row_count):
+        """Parse a response body into records if it matches the rows on screen."""
+        records, total = extract_records(body)
+        if total is not None:
+            self.totals[section_name] = total
+        if not records or len(records) != row_count:
+            return None
+        return records
+
+
+class FingerprintStats:
+    """
+    How many sections were skipped because their applicant total matched the
+    fingerprint from the last full scan, and how many vacancies that skipped entirely.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sections = {}
+
+    def record(self, job_title, section_name, skipped):
+        with self.lock:
+            self.sections.setdefault(job_title, {})[section_name] = skipped
+
+    def report(self):
+        with self.lock:
+            sections, self.sections = self.sections, {}
+        if not sections:
+            return {}
+        results = [skipped for job in sections.values() for skipped in job.values()]
+        stats = {
+            "sections": len(results),
+            "sections_skipped": sum(results),
+            "vacancies": len(sections),
+            "vacancies_skipped": sum(all(job.values()) for job in sections.values()),
+        }
+        print("\n=== Change Detection Summary ===")
+        print(f"  Sections skipped (applicant count unchanged): {stats['sections_skipped']}/{stats['sections']} "
+              f"({100 * stats['sections_skipped'] / stats['sections']:.0f}%)")
+        print(f"  Vacancies skipped entirely: {stats['vacancies_skipped']}/{stats['vacancies']} "
+              f"({100 * stats['vacancies_skipped'] / stats['vacancies']:.0f}%)")
+        return stats
+
+
+fingerprint_stats = FingerprintStats()
+
+
+def choose_records(harvester, section_name, body, snapshot, row_count):
+    """
+    The table JSON's records when their names match the rows on screen (checked
+    against a single DOM snapshot of all rows), otherwise the snapshot.
+    """
+    if body is None:
+        return snapshot
+    try:
+        records = harvester.records_from_body(section_name, body, row_count)
+    except Exception as e:
+        print(f"    WARN: could not parse {section_name} response ({e}); reading rows from the page")
+        return snapshot
+    if records_match_rows(records, snapshot):
+        return records
+    if records:
+        print(f"    WARN: {section_name} response doesn't match the rows on screen; reading rows from the page")
+    return snapshot
+
+
+def read_page_records(page, rows, section_name, row_count):
+    """
+    Records for every row currently shown in a section, read in one go: the
+    intercepted table JSON or the DOM snapshot, as choose_records decides.
+    """
+    harvester = TableHarvester.for_page(page)
+    response = harvester.take_latest(section_name)
+    snapshot = rows.evaluate_all(ROWS_SNAPSHOT_JS, NAME_SELECTORS[section_name])
+    body = None
+    if response is not None:
+        try:
+            body = response.json()
+        except Exception as e:
+            print(f"    WARN: could not parse {section_name} response ({e}); reading rows from the page")
+    return choose_records(harvester, section_name, body, snapshot, row_count)
+
+
+async def read_page_records_async(page, rows, section_name, row_count):
+    """Async version of read_page_records."""
+    harvester = TableHarvester.for_page(page)
+    response = harvester.take_latest(section_name)
+    snapshot = await rows.evaluate_all(ROWS_SNAPSHOT_JS, NAME_SELECTORS[section_name])
+    body = None
+    if response is not None:
+        try:
+            body = await response.json()
+        except Exception as e:
+            print(f"    WARN: could not parse {section_name} response ({e}); reading rows from the page")
+    return choose_records(harvester, section_name, body, snapshot, row_count)
@@ -0,0 +1,94 @@
+from services.cv_store import get_cv_store
+from datetime import datetime
+import os
+import sqlite3
+import threading
+
+LEDGER_DB = os.path.join("data", "submission_ledger.db")
+
+SUBMITTED = "submitted"
+ACCEPTED = "accepted"
+FAILED = "failed"
+
+
+class SubmissionLedger:
+    """
+    Which S3 objects were sent to which downstream endpoint, and how that went.
+    Rows are keyed by (endpoint, s3_key) and carry the content hash, so a CV that
+    an endpoint already accepted is recognised under any key it was uploaded to.
+    Only `accepted` filters a resume out; `submitted` (in flight or interrupted)
+    and `failed` are sent again. Hashes are looked up in `store`, the run's
+    CvStore unless one is given.
+    """
+
+    def __init__(self, db_file=LEDGER_DB, store=None):
+        self.store = store
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS submissions (
+                    endpoint TEXT,
+                    s3_key TEXT,
+                    sha256 TEXT,
+                    status TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    updated_at TEXT,
+                    PRIMARY KEY (endpoint, s3_key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_submissions_sha ON submissions (endpoint, sha256, status);
+            """)
+
+    def _sha_for_key(self, s3_key):
+        return (self.store or get_cv_store()).sha_for_key(s3_key)
+
+    def is_accepted(self, endpoint, s3_key, sha256=None):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM submissions WHERE endpoint = ? AND status = ? AND (s3_key = ? OR (sha256 IS NOT NULL AND sha256 = ?))",
+                (endpoint, ACCEPTED, s3_key, sha256),
+            ).fetchone()
+        return row is not None
+
+    def filter_new(self, endpoint, s3_keys):
+        """
+        The keys this endpoint hasn't accepted yet, keeping one key per content hash.
+        Returns (to_send, skipped).
+        """
+        to_send, skipped, seen = [], [], set()
+        for s3_key in s3_keys:
+            sha256 = self._sha_for_key(s3_key)
+            if (sha256 and sha256 in seen) or self.is_accepted(endpoint, s3_key, sha256):
+                skipped.append(s3_key)
+                continue
+            if sha256:
+                seen.add(sha256)
+            to_send.append(s3_key)
+        return to_send, skipped
+
+    def record(self, endpoint, s3_keys, status):
+        now = datetime.now().isoformat()
+        rows = [(endpoint, s3_key, self._sha_for_key(s3_key), status, int(status == SUBMITTED), now) for s3_key in s3_keys]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO submissions (endpoint, s3_key, sha256, status, attempts, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (endpoint, s3_key) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at, "
+                "sha256 = COALESCE(excluded.sha256, submissions.sha256), "
+                "attempts = submissions.attempts + excluded.attempts",
+                rows,
+            )
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """The run's SubmissionLedger; data/submission_ledger.db is opened on first use rather than at import."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = SubmissionLedger()
+        return _ledger
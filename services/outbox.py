@@ -0,0 +1,180 @@
+from config.settings import RESUME_PARSER_URL, OUTBOX_MAX_ATTEMPTS
+from datetime import datetime, timedelta
+import json
+import os
+import sqlite3
+import threading
+
+OUTBOX_DB = os.path.join("data", "outbox.db")
+OUTBOX_LOG = os.path.join("data", "outbox.log")
+CLAIM_SECONDS = 300
+
+
+class Outbox:
+    """
+    Durable queue of calls to downstream services (resume processing on EC2, the
+    resume parser's job grouping). The scraper records what has to be sent and
+    exits; drain() - run by drain_outbox.py - delivers entries, retrying failures
+    with backoff until OUTBOX_MAX_ATTEMPTS. Entries are claimed before delivery
+    so several drainers can run at once. An entry can depend on another one (the
+    parser's grouping on the same run's resume processing): it is only claimed
+    once that entry is delivered, and gives up with it.
+    """
+
+    def __init__(self, db_file=OUTBOX_DB, max_attempts=OUTBOX_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT,
+                payload TEXT,
+                created_at TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at TEXT,
+                claimed_until TEXT,
+                last_error TEXT,
+                delivered_at TEXT,
+                result TEXT,
+                depends_on INTEGER
+            )
+        """)
+        try:
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN depends_on INTEGER")
+        except sqlite3.OperationalError:
+            pass  # already there
+
+    def enqueue(self, kind, payload, depends_on=None):
+        """Queue a call; with `depends_on` it waits for that entry to be delivered first."""
+        now = datetime.now().isoformat()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO outbox (kind, payload, created_at, next_attempt_at, depends_on) VALUES (?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), now, now, depends_on),
+            )
+        return cursor.lastrowid
+
+    def claim(self, limit=20):
+        """Take up to `limit` due entries for delivery: [(id, kind, payload, attempts)]."""
+        now = datetime.now()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # an entry whose dependency gave up can never go out
+                self.conn.execute(
+                    "UPDATE outbox SET attempts = ?, last_error = 'outbox #' || depends_on || ' gave up' "
+                    "WHERE delivered_at IS NULL AND attempts < ? AND depends_on IN "
+                    "(SELECT id FROM outbox WHERE delivered_at IS NULL AND attempts >= ?)",
+                    (self.max_attempts, self.max_attempts, self.max_attempts),
+                )
+                rows = self.conn.execute(
+                    "SELECT id, kind, payload, attempts FROM outbox "
+                    "WHERE delivered_at IS NULL AND attempts < ? AND next_attempt_at <= ? "
+                    "AND (claimed_until IS NULL OR claimed_until < ?) "
+                    "AND (depends_on IS NULL OR depends_on IN (SELECT id FROM outbox WHERE delivered_at IS NOT NULL)) "
+                    "ORDER BY id LIMIT ?",
+                    (self.max_attempts, now.isoformat(), now.isoformat(), limit),
+                ).fetchall()
+                claimed_until = (now + timedelta(seconds=CLAIM_SECONDS)).isoformat()
+                self.conn.executemany("UPDATE outbox SET claimed_until = ? WHERE id = ?",
+                                      [(claimed_until, row[0]) for row in rows])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [(entry_id, kind, json.loads(payload), attempts) for entry_id, kind, payload, attempts in rows]
+
+    def mark_delivered(self, entry_id, result=None):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE outbox SET delivered_at = ?, claimed_until = NULL, result = ? WHERE id = ?",
+                (datetime.now().isoformat(), json.dumps(result, default=str), entry_id),
+            )
+
+    def mark_failed(self, entry_id, attempts, error, payload=None):
+        """Record a failed attempt and schedule the next one; `payload` replaces what's left to send."""
+        delay = min(3600, 30 * 2 ** attempts)
+        next_attempt_at = (datetime.now() + timedelta(seconds=delay)).isoformat()
+        with self.lock:
+            if payload is not None:
+                self.conn.execute("UPDATE outbox SET payload = ? WHERE id = ?", (json.dumps(payload), entry_id))
+            self.conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ?, claimed_until = NULL "
+                "WHERE id = ?",
+                (str(error)[:2000], next_attempt_at, entry_id),
+            )
+
+    def counts(self):
+        with self.lock:
+            pending, failed, delivered = self.conn.execute(
+                "SELECT "
+                "SUM(delivered_at IS NULL AND attempts < ?), "
+                "SUM(delivered_at IS NULL AND attempts >= ?), "
+                "SUM(delivered_at IS NOT NULL) FROM outbox",
+                (self.max_attempts, self.max_attempts),
+            ).fetchone()
+        return {"pending": pending or 0, "failed": failed or 0, "delivered": delivered or 0}
+
+
+def _deliver_ec2_process(payload):
+    """Send uploaded keys for resume processing; returns (result, keys still to send)."""
+    from services.ec2endpoint import mfjendpoint
+
+    keys = payload["keys"]
+    result = mfjendpoint().submit_keys(keys)
+    done = set(result["accepted"]) | set(result["skipped"])
+    return result, [key for key in keys if key not in done]
+
+
+def _deliver_resume_parser(payload):
+    """Ask the parser to group the run's job folders. Not ledgered: a folder is regrouped whenever it gets new resumes."""
+    import requests
+
+    response = requests.post(
+        f"{RESUME_PARSER_URL}/mfj-job-processer?mode=group&max_batch=1000",
+        headers={
+            "accept": "application/json",
+            "Content-Type": "application/json",
+        },
+        json={"ids": payload["ids"]},
+        timeout=60,
+    )
+    response.raise_for_status()
+    return response.json(), []
+
+
+HANDLERS = {
+    "ec2_process": _deliver_ec2_process,
+    "resume_parser": _deliver_resume_parser,
+}
+
+
+def drain(outbox=None, batch=20):
+    """Deliver every due entry once. Returns {"delivered", "failed"} counts for this pass."""
+    outbox = outbox or Outbox()
+    delivered = failed = 0
+    while True:
+        entries = outbox.claim(batch)
+        if not entries:
+            break
+        for entry_id, kind, payload, attempts in entries:
+            try:
+                result, remaining = HANDLERS[kind](payload)
+            except Exception as e:
+                print(f"Outbox #{entry_id} ({kind}) failed: {e}")
+                outbox.mark_failed(entry_id, attempts, e)
+                failed += 1
+                continue
+            if remaining:
+                # partly accepted: keep only what still has to go out
+                outbox.mark_failed(entry_id, attempts, "; ".join(result.get("errors", [])) or "partial delivery",
+                                   dict(payload, keys=remaining))
+                failed += 1
+            else:
+                outbox.mark_delivered(entry_id, result)
+                print(f"Outbox #{entry_id} ({kind}) delivered")
+                delivered += 1
+    return {"delivered": delivered, "failed": failed}
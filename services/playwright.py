@@ -1,22 +1,91 @@
-from services.google_service import GoogleServices
-from services.aws import S3Services,get_or_create_job_folder
-from config.settings import MYFUTUREJOBS_PASS, MYFUTUREJOBS_USER, MYFUTUREJOBS_URL, RESUME_PARSER_URL
+from config.settings import MYFUTUREJOBS_PASS, MYFUTUREJOBS_USER, MYFUTUREJOBS_URL, CV_FETCH_ENABLED, SLOW_MO, MFJ_SEARCH_API_PATTERN, ZERO_DISK_UPLOAD, OUTBOX_SPAWN_DRAINER
+from services.cv_fetch import CvFetcher
+from services.cv_buffer import CvBuffer
+from services.cv_store import get_cv_store
+from services.uploader import uploader
+from services.outbox import Outbox, OUTBOX_LOG
+from services.harvest import TableHarvester, read_page_records, row_identity, identity_suffix, SECTION_PATTERNS, fingerprint_stats
+from services.browser_profile import new_scraping_context, profile_stats
+from services.throttle import throttle
+from services.session import load_storage_state, save_storage_state, cookies_valid, keep_session_fresh, PROFILE_BUTTON_SELECTOR, PORTAL_HOME_URL
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-from services.tracker import ScrapingTracker
+from services.tracker import ScrapingTracker, normalize_title
 import time
 import os
 from services.tracker import ScrapingTracker
+from functools import partial
+import subprocess
+import sys
 import shutil
-import requests
+import re
 
 tracker = ScrapingTracker()
 
+JOB_CARD_SELECTOR = '[data-test="swipe-vacancySummary-container"]'
+SEARCH_INPUT_SELECTOR = '[data-test="swipe-autocomplete--input"]'
+TABLE_ROW_SELECTOR = '[data-test="swipe-table-row"]'
+VACANCY_SECTIONS_SELECTOR = '#applicants, #matchedJobseekers'
+SEARCH_RESPONSE_PATTERN = re.compile(MFJ_SEARCH_API_PATTERN, re.IGNORECASE)
+
+
+def is_api_response(response, pattern):
+    """True for XHR/fetch responses whose URL matches pattern."""
+    return response.request.resource_type in ("xhr", "fetch") and pattern.search(response.url) is not None
+
+
+def click_and_wait_for_response(page, locator, pattern, action, timeout=30000):
+    """
+    Click and wait for the XHR the click triggers instead of sleeping.
+    Feeds the outcome to the throttle; falls back to a short networkidle wait if nothing matched.
+    """
+    try:
+        with page.expect_response(lambda r: is_api_response(r, pattern), timeout=timeout):
+            locator.click()
+        throttle.success()
+        return True
+    except PlaywrightTimeoutError:
+        print(f"    WARN: no matching response after {action}; waiting for the page to settle…")
+        throttle.failure()
+        try:
+            page.wait_for_load_state("networkidle", timeout=10000)
+        except PlaywrightTimeoutError:
+            pass
+        return False
+
 
 def make_safe_filename(name):
     """Cleans a string to be a valid filename."""
     return "".join(c for c in name if c.isalnum() or c in (' ', '_', '-')).strip()
 
 
+def get_section_dir(job_title, section_name):
+    """Return (and create) the local folder CVs for a job section are saved to."""
+    job_dir = os.path.join("tmp", make_safe_filename(job_title))
+    section_dir = os.path.join(job_dir, section_name.lower().replace(" ", "_"))
+    os.makedirs(section_dir, exist_ok=True)
+    return section_dir
+
+
+def get_section_start_positions(tracker, job_title):
+    """
+    Work out where each section should start from the job's resume state.
+    Returns ((applicants_page, applicants_row), (possible_matches_page, possible_matches_row)).
+    """
+    resume_state = tracker.find_resume_state(job_title)
+    if not resume_state:
+        return (1, 0), (1, 0)
+
+    section = resume_state.get("section_name")
+    page_num = resume_state.get("current_page", 1)
+    row_num = resume_state.get("current_row", 0)
+
+    if section == "Applicants":
+        return (page_num, row_num), (1, 0)
+    if section == "Possible Matches":
+        return (1, 0), (page_num, row_num)
+    return (1, 0), (1, 0)
+
+
 def setup_browser():
     """Set up and return a browser instance with appropriate configuration."""
     from playwright.sync_api import sync_playwright
@@ -24,9 +93,9 @@ def setup_browser():
     playwright = sync_playwright().start()
     browser = playwright.chromium.launch(
         headless=False,
-        slow_mo=50
+        slow_mo=SLOW_MO
     )
-    context = browser.new_context(accept_downloads=True)
+    context = new_scraping_context(browser, storage_state=load_storage_state())
     page = context.new_page()
     return playwright, browser, page
 
@@ -39,9 +108,19 @@ def login_to_portal(page):
     page.goto(MYFUTUREJOBS_URL)
     page.fill('input[name="username"]', MYFUTUREJOBS_USER)
     page.fill('input[name="password"]', MYFUTUREJOBS_PASS)
-    time.sleep(3)
     page.click('input[name="login"]')
-    page.wait_for_load_state('networkidle')
+    page.wait_for_selector(PROFILE_BUTTON_SELECTOR, timeout=60000)
+    save_storage_state(page.context)
+
+
+def ensure_logged_in(page):
+    """Reuse the saved session when it still works; log in only when it doesn't."""
+    if cookies_valid(page.context.cookies()):
+        page.goto(PORTAL_HOME_URL)
+        if is_logged_in(page):
+            print("Reusing saved portal session.")
+            return
+    login_to_portal(page)
 
 
 def get_job_listings(page):
@@ -60,7 +139,7 @@ def search_for_job(page, search_term):
         print(f"Searching for job: '{search_term}'")
         start_time = time.time()
 
-        search_input = page.locator('[data-test="swipe-autocomplete--input"]').first
+        search_input = page.locator(SEARCH_INPUT_SELECTOR).first
         print("Clearing search field...")
         search_input.clear()
 
@@ -73,14 +152,17 @@ def search_for_job(page, search_term):
         print("Clicking search button...")
         click_start = time.time()
         search_button = page.locator('[data-test="swipe-searchInputs-search"]')
-        search_button.click()
+        click_and_wait_for_response(page, search_button, SEARCH_RESPONSE_PATTERN, "search")
         click_end = time.time()
         print(f"Search button clicked in {click_end - click_start:.2f} seconds")
 
         print("Waiting for search results to load...")
         wait_start = time.time()
-        page.wait_for_load_state('networkidle', timeout=30000)
-        time.sleep(3)
+        try:
+            page.wait_for_selector(JOB_CARD_SELECTOR, timeout=10000)
+        except PlaywrightTimeoutError:
+            print("No job cards appeared for this search.")
+        throttle.pause("search")
         wait_end = time.time()
         print(f"Search results loaded in {wait_end - wait_start:.2f} seconds")
 
@@ -96,182 +178,318 @@ def search_for_job(page, search_term):
 from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 import os, time
 
-def download_cvs_from_section(page, section_name, section_selector, job_title, download_index_start, job_index, start_page=1, start_row=0):
+
+def click_cv_download(page, row, section_name):
+    """
+    Download a row's CV through the UI and return the Playwright Download.
+    Returns None if the row has no CV button.
+    """
+    if section_name == "Applicants":
+        # --- open the attachments menu in the DOWNLOAD column ---
+        download_cell = row.locator('[data-test="swipe-table-cell--download"]').first
+        toggle = download_cell.locator('[data-test="swipe-applicantsOverview-attachments"]').first
+
+        # ensure in view and close any open menus first
+        try:
+            row.scroll_into_view_if_needed()
+            download_cell.scroll_into_view_if_needed()
+            page.keyboard.press("Escape")
+        except Exception:
+            pass
+
+        # open dropdown
+        toggle.wait_for(state="attached", timeout=5000)
+        toggle.click()  # aria-expanded toggles to true
+
+        # wait for the CV item in THIS cell's dropdown
+        cv_item = download_cell.locator('div.dropdown-menu >> button.dropdown-item:has-text("CV")').first
+        cv_item.wait_for(state="visible", timeout=6000)
+
+        # click CV and capture download
+        with page.expect_download() as di:
+            cv_item.click()
+
+        # close dropdown for cleanliness
+        try:
+            page.keyboard.press("Escape")
+        except Exception:
+            pass
+        return di.value
+
+    if section_name == "Possible Matches":
+        # Prefer the icon inside the CV column
+        cv_cell = row.locator('[data-test="swipe-table-cell--cv"]').first
+        download_btn = cv_cell.locator('.fa-download, .fa-file-pdf-o, [data-test="swipe-download"]').first
+
+        if download_btn.count() == 0:
+            # Extra fallback: any download icon in the row
+            download_btn = row.locator('.fa-download, .fa-file-pdf-o, [data-test="swipe-download"]').first
+
+        if download_btn.count() == 0:
+            return None
+
+        # Make sure the row and CV cell are onscreen, then click forcibly
+        try:
+            row.scroll_into_view_if_needed()
+        except Exception:
+            pass
+        try:
+            cv_cell.scroll_into_view_if_needed()
+        except Exception:
+            pass
+
+        with page.expect_download() as di:
+            # Click even if Playwright thinks it's not visible (icon can be within overflow container)
+            download_btn.click(force=True)
+        return di.value
+
+    return None
+
+
+def build_cv_filename(section_name, name, download_index, identity=None):
+    """
+    Filename a CV is saved under for its section. Possible Matches files carry a
+    suffix from the row identity (the download index when there is none) so names can repeat.
+    """
+    if section_name == "Possible Matches":
+        suffix = identity_suffix(identity) if identity else download_index
+        return f"{make_safe_filename(name or '') or f'candidate_{download_index}'}_{suffix}.pdf"
+    return f"{make_safe_filename(name or '') or f'applicant_{download_index}'}.pdf"
+
+
+def save_resume_point(tracker, job_index, job_title, section_name, page_num, row, worker=None):
+    """Record where a section scan has got to and save the tracker (writes are rate-limited)."""
+    tracker.set_resume_state(job_index, job_title, section_name, page_num, row, worker=worker)
+    tracker.save_tracker()
+
+
+def section_unchanged(page, tracker, job_title, section_name, start_page, start_row):
+    """
+    First-page check: the section total in the table response is the same as at
+    the last full scan, so there is nothing new. Never true for a resumed scan.
+    """
+    total = TableHarvester.for_page(page).totals.get(section_name)
+    if start_page == 1 and start_row == 0 and tracker.is_section_unchanged(job_title, section_name, total):
+        print(f"  - '{section_name}' still has {total} entries, same as the last full scan. Skipping.")
+        fingerprint_stats.record(job_title, section_name, skipped=True)
+        return True
+    fingerprint_stats.record(job_title, section_name, skipped=False)
+    return False
+
+
+def plan_row_download(record, tracker, job_title, section_name, section_dir, download_index):
+    """
+    (identity, filename, local_path) for a row's CV, or None if the row was
+    already downloaded, matched on its identity first and then on the filename.
+    """
+    # de-dupe on the row itself, before anything is clicked or fetched
+    identity = row_identity(record)
+    if identity and tracker.is_applicant_downloaded(job_title, section_name, identity):
+        print(f"    SKIP: {record['name'] or identity} (already downloaded)")
+        return None
+    filename = build_cv_filename(section_name, record["name"], download_index, identity)
+    if tracker.is_file_downloaded(job_title, section_name, filename):
+        print(f"    SKIP: {filename} (already downloaded)")
+        return None
+    return identity, filename, os.path.join(section_dir, filename)
+
+
+def record_section_scan(page, tracker, job_title, section_name, complete):
+    """Keep the section total as the fingerprint after a complete scan; anything that failed is retried next run."""
+    if complete:
+        tracker.record_section_count(job_title, section_name, TableHarvester.for_page(page).totals.get(section_name))
+
+
+def store_cv(local_path, job_title, section_name, filename, tracker, identity=None, sha256=None):
+    """Hand a saved CV to the content store, record the download and queue its upload."""
+    sha256, is_new = get_cv_store().add(local_path, job_title, section_name, filename, sha256)
+    print(f"    Downloaded: {local_path}" + ("" if is_new else f" (same CV as {sha256[:12]}, stored once)"))
+    tracker.mark_file_downloaded(job_title, section_name, filename, identity=identity)
+    uploader.submit(job_title, section_name, filename, sha256)
+    return sha256
+
+
+def store_cv_buffer(buffer, job_title, section_name, filename, tracker, identity=None):
+    """store_cv for a CV held in memory (ZERO_DISK_UPLOAD): it goes to S3 without touching tmp/."""
+    is_new = get_cv_store().add_ref(job_title, section_name, filename, buffer.sha256, buffer.size)
+    where = "spilled to disk" if buffer.spilled else "in memory"
+    print(f"    Downloaded: {filename} ({buffer.size // 1024} KB {where})" + ("" if is_new else f" (same CV as {buffer.sha256[:12]}, stored once)"))
+    tracker.mark_file_downloaded(job_title, section_name, filename, identity=identity)
+    if not is_new:
+        buffer.close()
+    uploader.submit(job_title, section_name, filename, buffer.sha256, buffer if is_new else None)
+    return buffer.sha256
+
+
+def store_fetched(result, local_path, job_title, section_name, filename, tracker, identity=None):
+    """Store what CvFetcher.fetch returned: a CvBuffer with ZERO_DISK_UPLOAD, else the sha256 of local_path."""
+    if isinstance(result, CvBuffer):
+        return store_cv_buffer(result, job_title, section_name, filename, tracker, identity)
+    return store_cv(local_path, job_title, section_name, filename, tracker, identity, result)
+
+
+def fetch_cv(fetcher, cv_url, local_path, job_title, section_name, filename, tracker, identity=None):
+    """Start a background fetch that stores the CV on the fetch thread; returns its Future."""
+    return fetcher.submit(
+        cv_url, None if ZERO_DISK_UPLOAD else local_path,
+        then=partial(store_fetched, local_path=local_path, job_title=job_title, section_name=section_name,
+                     filename=filename, tracker=tracker, identity=identity),
+    )
+
+
+def store_download(d, local_path, job_title, section_name, filename, tracker, identity=None):
+    """
+    Keep a finished Playwright download. With ZERO_DISK_UPLOAD the browser's own
+    temp file is read straight into memory instead of being copied into tmp/.
+    """
+    if ZERO_DISK_UPLOAD:
+        return store_cv_buffer(CvBuffer.from_file(d.path()), job_title, section_name, filename, tracker, identity)
+    d.save_as(local_path)
+    return store_cv(local_path, job_title, section_name, filename, tracker, identity)
+
+
+def finish_pending_fetches(page, rows, pending_fetches, section_name, job_title, tracker):
+    """
+    Wait for background CV fetches, falling back to the download menu for any that failed.
+    Returns the number of rows whose CV couldn't be stored either way.
+    """
+    failed = 0
+    for i, filename, identity, local_path, future in pending_fetches:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"    WARN: direct fetch failed for row {i+1} ({e}); using the download menu instead")
+            try:
+                d = click_cv_download(page, rows.nth(i), section_name)
+                if d is None:
+                    print(f"    No download button found in row {i+1}, skipping…")
+                    failed += 1
+                    continue
+                store_download(d, local_path, job_title, section_name, filename, tracker, identity)
+            except Exception as click_error:
+                print(f"    ERROR row {i+1}: {click_error}")
+                failed += 1
+                try: page.keyboard.press("Escape")
+                except: pass
+    pending_fetches.clear()
+    return failed
+
+
+def download_cvs_from_section(page, section_name, section_selector, job_title, download_index_start, job_index, start_page=1, start_row=0, tracker=tracker, worker=None):
     """
     Downloads all CVs from a section to local disk:
       tmp/<job_title>/<section_name>/filename.pdf
     Handles pagination and both Applicants / Possible Matches tables.
+    Once the CV URL pattern is learned from the first clicked download, the
+    remaining rows are fetched over HTTP in parallel (see services.cv_fetch).
+    Returns (next download index, number of rows whose CV couldn't be stored).
     """
     print(f"\n[+] Checking for '{section_name}' section...")
 
     # local dirs
-    job_dir = os.path.join("tmp", make_safe_filename(job_title))
-    section_dir = os.path.join(job_dir, section_name.lower().replace(" ", "_"))
-    os.makedirs(section_dir, exist_ok=True)
+    section_dir = get_section_dir(job_title, section_name)
 
     # quick presence check
     if page.locator(section_selector).count() == 0 or not page.locator(section_selector).is_visible():
         print(f"[-] Section '{section_name}' not found or not visible. Skipping.")
-        return download_index_start
+        return download_index_start, 0
 
     download_index = download_index_start
     current_page_num = 1
+    failed_rows = 0
+    skipped = False
+    found_rows = False
+    pending_fetches = []
+    fetcher = None
+    if CV_FETCH_ENABLED:
+        fetcher = CvFetcher(page.context.cookies(), user_agent=page.evaluate("navigator.userAgent"))
 
     while True:
         # re-select container each loop to avoid stale refs after pagination
         section_container = page.locator(section_selector)
         row_start = start_row if current_page_num == start_page else 0
         print(f"  - Scanning Page {current_page_num} in '{section_name}' for '{job_title}' (starting from row {row_start})")
-        tracker.set_resume_state(job_index, job_title, section_name, current_page_num, row_start)
-        tracker.save_tracker()
+        save_resume_point(tracker, job_index, job_title, section_name, current_page_num, row_start, worker)
         try:
-            page.wait_for_load_state('networkidle', timeout=20000)
+            section_container.locator(TABLE_ROW_SELECTOR).first.wait_for(state="visible", timeout=10000)
         except PlaywrightTimeoutError:
-            print("    WARN: networkidle timed out; continuing…")
+            print("    WARN: no table rows appeared; continuing…")
 
-        rows = section_container.locator('[data-test="swipe-table-row"]')
+        rows = section_container.locator(TABLE_ROW_SELECTOR)
         row_count = rows.count()
         if row_count == 0 and current_page_num == 1:
             print("    No rows found on this page.")
             break
+        found_rows = True
+
+        # names and ids for every row on this page in one go (table JSON, else one DOM snapshot)
+        records = read_page_records(page, rows, section_name, row_count)
+
+        if current_page_num == 1 and section_unchanged(page, tracker, job_title, section_name, start_page, start_row):
+            skipped = True
+            break
 
         for i in range(row_start, row_count):
-            tracker.set_resume_state(job_index, job_title, section_name, current_page_num, i)
-            tracker.save_tracker()
+            save_resume_point(tracker, job_index, job_title, section_name, current_page_num, i, worker)
+            keep_session_fresh(page)
             row = rows.nth(i)
 
             try:
-                if section_name == "Applicants":
-                    # --- open the attachments menu in the DOWNLOAD column ---
-                    download_cell = row.locator('[data-test="swipe-table-cell--download"]').first
-                    toggle = download_cell.locator('[data-test="swipe-applicantsOverview-attachments"]').first
-
-                    # ensure in view and close any open menus first
-                    try:
-                        row.scroll_into_view_if_needed()
-                        download_cell.scroll_into_view_if_needed()
-                        page.keyboard.press("Escape")
-                    except Exception:
-                        pass
-
-                    # open dropdown
-                    toggle.wait_for(state="attached", timeout=5000)
-                    toggle.click()  # aria-expanded toggles to true
-
-                    # wait for the CV item in THIS cell's dropdown
-                    cv_item = download_cell.locator('div.dropdown-menu >> button.dropdown-item:has-text("CV")').first
-                    cv_item.wait_for(state="visible", timeout=6000)
-
-                    # click CV and capture download
-                    with page.expect_download() as di:
-                        cv_item.click()
-                    d = di.value
-
-                    # build filename from Name column
-                    try:
-                        name_el = row.locator('[data-test="swipe-table-cell--jobseekerName"] span').first
-                        applicant_name = (name_el.inner_text() or "").strip() if name_el.count() else f"applicant_{download_index}"
-                    except Exception:
-                        applicant_name = f"applicant_{download_index}"
-
-                    filename = f"{make_safe_filename(applicant_name) or f'applicant_{download_index}'}.pdf"
-                    local_path = os.path.join(section_dir, filename)
-
-                    # de-dupe + save + track
-                    if tracker.is_file_downloaded(job_title, section_name, filename):
-                        print(f"    SKIP: {filename} (already downloaded)")
-                    else:
-                        d.save_as(local_path)
-                        print(f"    Downloaded: {local_path}")
-                        tracker.mark_file_downloaded(job_title, section_name, filename)
-                        download_index += 1
-
-                    # close dropdown for cleanliness
-                    try:
-                        page.keyboard.press("Escape")
-                    except Exception:
-                        pass
-
-                elif section_name == "Possible Matches":
-                    # Prefer the icon inside the CV column
-                    cv_cell = row.locator('[data-test="swipe-table-cell--cv"]').first
-                    download_btn = cv_cell.locator('.fa-download, .fa-file-pdf-o, [data-test="swipe-download"]').first
-
-                    if download_btn.count() == 0:
-                        # Extra fallback: any download icon in the row
-                        download_btn = row.locator('.fa-download, .fa-file-pdf-o, [data-test="swipe-download"]').first
-
-                    if download_btn.count() == 0:
-                        print(f"    No download button found in row {i+1} (after fallback), skipping…")
-                        continue
+                record = records[i]
+                planned = plan_row_download(record, tracker, job_title, section_name, section_dir, download_index)
+                if planned is None:
+                    continue
+                identity, filename, local_path = planned
 
-                    # Make sure the row and CV cell are onscreen, then click forcibly
-                    try:
-                        row.scroll_into_view_if_needed()
-                    except Exception:
-                        pass
-                    try:
-                        cv_cell.scroll_into_view_if_needed()
-                    except Exception:
-                        pass
-
-                    with page.expect_download() as di:
-                        # Click even if Playwright thinks it's not visible (icon can be within overflow container)
-                        download_btn.click(force=True)
-                    d = di.value
-
-                    # candidate name (best-effort)
-                    candidate_name = None
-                    try:
-                        name_el = row.locator('[data-test="swipe-table-cell--name"] span').first
-                        if name_el.count():
-                            candidate_name = (name_el.inner_text() or "").strip()
-                    except:
-                        pass
-                    if not candidate_name:
-                        try:
-                            guess = row.locator('span.add-ellipsis.cursor-pointer').first
-                            candidate_name = (guess.inner_text() or "").strip() if guess.count() else None
-                        except:
-                            pass
-                    if not candidate_name:
-                        candidate_name = f"candidate_{download_index}"
-
-                    filename = f"{make_safe_filename(candidate_name) or f'candidate_{download_index}'}_{download_index}.pdf"
-
-                    if tracker.is_file_downloaded(job_title, section_name, filename):
-                        print(f"    SKIP: {filename} (already downloaded)")
-                        continue
+                row_tokens = record["tokens"]
+                cv_url = fetcher.resolve(row_tokens) if fetcher else None
 
-                    local_path = os.path.join(section_dir, filename)
-                    d.save_as(local_path)
-                    print(f"    Downloaded: {local_path}")
+                if cv_url:
+                    # fast path: fetch the CV over HTTP in the background, no dropdowns
+                    future = fetch_cv(fetcher, cv_url, local_path, job_title, section_name, filename, tracker, identity)
+                    pending_fetches.append((i, filename, identity, local_path, future))
+                    download_index += 1
+                else:
+                    d = click_cv_download(page, row, section_name)
+                    if d is None:
+                        print(f"    No download button found in row {i+1} (after fallback), skipping…")
+                        failed_rows += 1
+                        continue
+                    if fetcher:
+                        fetcher.learn(d.url, row_tokens)
 
-                    tracker.mark_file_downloaded(job_title, section_name, filename)
+                    store_download(d, local_path, job_title, section_name, filename, tracker, identity)
                     download_index += 1
+                    throttle.success()
+                    throttle.pause("cv")
 
-                time.sleep(3)
                 if download_index > 10:
                     print(f"⚠️ Reached hard limit of 1500 downloads in '{section_name}'. Stopping.")
-                    return download_index
+                    failed_rows += finish_pending_fetches(page, rows, pending_fetches, section_name, job_title, tracker)
+                    if fetcher:
+                        fetcher.close()
+                    return download_index, failed_rows
 
             except PlaywrightTimeoutError:
                 print(f"    WARN: Timeout while processing row {i+1}.")
+                failed_rows += 1
+                throttle.failure()
                 try: page.keyboard.press("Escape")
                 except: pass
             except Exception as e:
                 print(f"    ERROR row {i+1}: {e}")
+                failed_rows += 1
+                throttle.failure()
                 try: page.keyboard.press("Escape")
                 except: pass
 
+        # background fetches must land (or fall back to clicking) before the rows change
+        failed_rows += finish_pending_fetches(page, rows, pending_fetches, section_name, job_title, tracker)
+
         # --- pagination: try Next, else next number ---
         pagination = section_container.locator("ul.pagination")
         if pagination.count() == 0:
-            first_page_link = pagination.locator('li.page-item a.page-link:has-text("1")').first
-            first_page_link.click()
             print(f"  - Finished all pages for '{section_name}'.")
-            page.wait_for_load_state("networkidle", timeout=10000)
-            time.sleep(1)
             break
 
         # Try Next button first (aria-label or » symbol)
@@ -282,10 +500,8 @@ def download_cvs_from_section(page, section_name, section_selector, job_title, d
 
         if next_btn.count() and next_btn.is_visible():
             print("    Navigating to next page via Next…")
-            next_btn.click()
-            page.wait_for_load_state("networkidle")
+            click_and_wait_for_response(page, next_btn, SECTION_PATTERNS[section_name], "next page")
             current_page_num += 1
-            # keep_session_alive(page)
             continue
 
         # Fallback: numbered pages
@@ -297,116 +513,192 @@ def download_cvs_from_section(page, section_name, section_selector, job_title, d
             break
 
         print(f"    Navigating to page {next_number}…")
-        next_link.click()
-        page.wait_for_load_state("networkidle")
+        click_and_wait_for_response(page, next_link, SECTION_PATTERNS[section_name], f"page {next_number}")
         current_page_num += 1
 
-    return download_index
+    if fetcher:
+        fetcher.close()
+    record_section_scan(page, tracker, job_title, section_name, found_rows and not skipped and not failed_rows)
+    return download_index, failed_rows
 
 def is_logged_in(page):
-    """Check if the user is currently logged in by verifying the presence of the user profile button."""
+    """
+    Check if the user is currently logged in: the portal cookies must still be valid
+    and the user profile button present (with only a short wait if the page is mid-render).
+    """
     try:
-        profile_button = page.locator('[data-test="swipe-navbarUser-profile"]')
-        profile_button.wait_for(state="visible", timeout=6000)
-        return profile_button.count() > 0 and profile_button.is_visible()
+        if not cookies_valid(page.context.cookies()):
+            return False
+        profile_button = page.locator(PROFILE_BUTTON_SELECTOR)
+        if profile_button.is_visible():
+            return True
+        profile_button.wait_for(state="visible", timeout=1500)
+        return True
     except Exception as e:
         print(f"Error checking login status: {e}")
         return False
 
-# def keep_session_alive(page):
-#     """Click on user profile to prevent inactivity logout and simulate dropdown."""
-#     try:
-#         profile_button = page.locator('[data-test="swipe-navbarUser-profile"]')
-#         if profile_button.count() == 0:
-#             print("User profile button not found")
-#             return
-#         if not profile_button.is_visible():
-#             print("User profile button not visible")
-#             return
-#         time.sleep(1)
-#         profile_button.scroll_into_view_if_needed()
-#         profile_button.click(force=True)
-#         time.sleep(0.5)  # Wait for UI to respond
-#         print("Clicked on user profile to keep session alive (force click)")
-#     except Exception as e:
-#         print(f"Could not click on user profile: {e}")
-
-
-def process_search_results(page, job_query, job_index):
-    """Process the first matching job from search results."""
+def open_vacancy(page, url):
+    """
+    Open a vacancy straight from its MFJ link. False if the vacancy sections don't
+    show up (stale link, expired or removed vacancy).
+    """
+    # start listening before navigating so the first table responses are captured
+    TableHarvester.for_page(page).reset()
     try:
-        # Get job cards after search
-        job_cards = page.locator('[data-test="swipe-vacancySummary-container"]')
+        page.goto(url)
+        page.wait_for_selector(VACANCY_SECTIONS_SELECTOR, timeout=30000)
+    except PlaywrightTimeoutError:
+        print(f"WARN: vacancy sections did not appear at {url}")
+        throttle.failure()
+        return False
+    throttle.success()
+    return True
+
+
+def scrape_vacancy(page, job_title, job_index, tracker=tracker, worker=None):
+    """
+    Download the CVs of both sections of the vacancy open on the page.
+    True if every row's CV was stored; rows that failed are retried on a later run.
+    """
+    # Check resume state for this job
+    (applicants_start_page, applicants_start_row), (possible_matches_start_page, possible_matches_start_row) = \
+        get_section_start_positions(tracker, job_title)
+
+    # Process "Applicants" section
+    download_index_counter, applicants_failed = download_cvs_from_section(
+        page, "Applicants", "#applicants", job_title, 1, job_index,
+        applicants_start_page, applicants_start_row, tracker=tracker, worker=worker
+    )
+
+    # Process "Possible Matches" section
+    _, matches_failed = download_cvs_from_section(
+        page, "Possible Matches", "#matchedJobseekers", job_title, download_index_counter, job_index,
+        possible_matches_start_page, possible_matches_start_row, tracker=tracker, worker=worker
+    )
+
+    return finish_vacancy(tracker, job_title, applicants_failed + matches_failed)
 
-        for i in range(job_cards.count()):
-            job = job_cards.nth(i)
-            try:
-                job.scroll_into_view_if_needed()
-                if job.locator('h5.font-size-big span.text-decoration-line-through').count() > 0:
-                    print(f"Skipping expired jobs")
-                    continue
-                title_element = job.locator('h5.font-size-big')
-                job_title = title_element.inner_text().strip()
-                query_lower = ' '.join(job_query.lower().split())
-                title_lower = ' '.join(job_title.lower().split())
-
-                if query_lower == title_lower:
-                    job.click()
-                    print(f"\nProcessing Job: {job_title}")
-                    page.wait_for_load_state('networkidle')
-                    time.sleep(2)
-
-                    download_index_counter = 1
-                    if download_index_counter > 1500:
-                        return download_index_counter
-
-                    # Check resume state for this job
-                    resume_state = tracker.get_resume_state()
-                    if resume_state and resume_state.get("current_job") == job_title:
-                        section = resume_state.get("section_name")
-                        page_num = resume_state.get("current_page", 1)
-                        row_num = resume_state.get("current_row", 0)
-
-                        if section == "Applicants":
-                            applicants_start_page = page_num
-                            applicants_start_row = row_num
-                            possible_matches_start_page = 1
-                            possible_matches_start_row = 0
-                        else:  # Possible Matches or later
-                            applicants_start_page = 1
-                            applicants_start_row = 0
-                            possible_matches_start_page = page_num if section == "Possible Matches" else 1
-                            possible_matches_start_row = row_num if section == "Possible Matches" else 0
-                    else:
-                        applicants_start_page = 1
-                        applicants_start_row = 0
-                        possible_matches_start_page = 1
-                        possible_matches_start_row = 0
-
-                    # Process "Applicants" section
-                    download_index_counter = download_cvs_from_section(
-                        page, "Applicants", "#applicants", job_title, download_index_counter, job_index,
-                        applicants_start_page, applicants_start_row
-                    )
-
-                    # Process "Possible Matches" section
-                    download_index_counter = download_cvs_from_section(
-                        page, "Possible Matches", "#matchedJobseekers", job_title, download_index_counter, job_index,
-                        possible_matches_start_page, possible_matches_start_row
-                    )
-
-                    tracker.update_job_info(job_title)
-
-                    print(f"Completed processing: {job_title}")
-                    break
-                else:
-                    print(f"Query '{query_lower}' didn't match with job title: '{title_lower}'")
-            except Exception as e:
-                print(f"ERROR: Error while processing job '{job_title}': {e}")
-                break
-            i += 1
-    except Exception as e:
-        print(f"ERROR: Failed to process search results: {e}")
+
+def finish_vacancy(tracker, job_title, failed):
+    """Record the job as processed; True if no row failed."""
+    tracker.update_job_info(job_title)
+    if failed:
+        print(f"WARN: {failed} CV(s) of '{job_title}' could not be stored; the job stays unscraped")
+    return not failed
+
+
+def known_vacancy_urls(sheet_job, tracker):
+    """
+    (title, urls, indexed) for opening a sheet job's vacancy without searching:
+    the sheet's MFJ link, then the URL an earlier search resolved the title to
+    (tracker vacancy index). indexed says whether the index had an entry.
+    """
+    link = sheet_job.get("link")
+    known = tracker.find_vacancy(sheet_job["job"])
+    # the portal's card title, as stored by the search that found the vacancy, so
+    # tracker keys, file names and S3 prefixes match whichever way it was opened
+    title = known["job_title"] if known else sheet_job["job"]
+    urls = [link] if link else []
+    if known and known["url"] != link:
+        urls.append(known["url"])
+    return title, urls, known is not None
+
+
+def open_known_vacancy(page, sheet_job, tracker=tracker):
+    """
+    Open a sheet job's vacancy from the URLs known_vacancy_urls gives. An indexed
+    URL that no longer opens the vacancy is dropped from the index.
+    Returns the title to scrape it under, or None if none opened.
+    """
+    title, urls, indexed = known_vacancy_urls(sheet_job, tracker)
+    for url in urls:
+        if open_vacancy(page, url):
+            if url != sheet_job.get("link"):
+                print(f"Opened '{title}' from the vacancy index")
+            return title
+    if indexed:
+        tracker.forget_vacancy(sheet_job["job"])
+    return None
+
+
+def process_job(page, sheet_job, job_index, tracker=tracker, worker=None):
+    """
+    Scrape one sheet job. The vacancy is opened from the sheet's MFJ link or the
+    vacancy index; searching for the title is the fallback when neither works.
+    Returns the scraped job title once every CV was stored, or None if the vacancy
+    wasn't found or some CVs failed. Errors that stop the scrape are raised.
+    """
+    job = sheet_job["job"]
+    job_title = open_known_vacancy(page, sheet_job, tracker=tracker)
+    if job_title:
+        print(f"\nProcessing Job: {job_title}")
+        if not scrape_vacancy(page, job_title, job_index, tracker=tracker, worker=worker):
+            return None
+        print(f"Completed processing: {job_title}")
+        return job_title
+
+    print(f"No working link for '{job}', searching for it")
+    if page.locator(SEARCH_INPUT_SELECTOR).count() == 0:
+        page.goto(PORTAL_HOME_URL)
+        page.wait_for_selector(SEARCH_INPUT_SELECTOR, timeout=30000)
+    search_for_job(page, job)
+    job_title = process_search_results(page, job, job_index, tracker=tracker, worker=worker)
+    navigate_back_to_listings(page)
+    return job_title
+
+
+def search_card_matches(card_title, expired, job_query, tracker):
+    """
+    True if a search result card is the job searched for. An expired card for
+    the job drops its URL from the vacancy index.
+    """
+    if expired:
+        if normalize_title(card_title) == normalize_title(job_query):
+            tracker.forget_vacancy(job_query)
+        print(f"Skipping expired jobs")
+        return False
+    if normalize_title(job_query) != normalize_title(card_title):
+        print(f"Query '{normalize_title(job_query)}' didn't match with job title: '{normalize_title(card_title)}'")
+        return False
+    return True
+
+
+def process_search_results(page, job_query, job_index, tracker=tracker, worker=None):
+    """
+    Process the first matching job from search results. Returns the matched job
+    title once every CV was stored, or None if no card matched or some CVs failed.
+    """
+    # Get job cards after search
+    job_cards = page.locator(JOB_CARD_SELECTOR)
+
+    for i in range(job_cards.count()):
+        job = job_cards.nth(i)
+        job.scroll_into_view_if_needed()
+        job_title = job.locator('h5.font-size-big').inner_text().strip()
+        expired = job.locator('h5.font-size-big span.text-decoration-line-through').count() > 0
+        if not search_card_matches(job_title, expired, job_query, tracker):
+            continue
+
+        # start listening before the click so the first table responses are captured
+        TableHarvester.for_page(page).reset()
+        job.click()
+        print(f"\nProcessing Job: {job_title}")
+        try:
+            page.wait_for_selector(VACANCY_SECTIONS_SELECTOR, timeout=30000)
+            throttle.success()
+            tracker.remember_vacancy(job_title, page.url)
+        except PlaywrightTimeoutError:
+            print("WARN: vacancy sections did not appear; continuing…")
+            throttle.failure()
+
+        if not scrape_vacancy(page, job_title, job_index, tracker=tracker, worker=worker):
+            return None
+        print(f"Completed processing: {job_title}")
+        return job_title
+
+    print(f"No search result matched '{job_query}'")
+    return None
 
 
 def navigate_back_to_listings(page):
@@ -414,79 +706,91 @@ def navigate_back_to_listings(page):
     try:
         page.go_back()
         # Wait for the job list to be present again before the next loop
-        page.wait_for_selector('[data-test="swipe-vacancySummary-container"]', timeout=60000)
-        page.wait_for_load_state('networkidle', timeout=30000)
+        page.wait_for_selector(JOB_CARD_SELECTOR, timeout=60000)
     except Exception as nav_error:
         print(f"    Warning: Navigation back failed: {nav_error}")
         print("    Attempting to reload the main page...")
+        throttle.failure()
         page.goto(MYFUTUREJOBS_URL.replace('/auth/', '/'))  # Go to main portal
-        page.wait_for_load_state('networkidle', timeout=30000)
+        page.wait_for_selector(JOB_CARD_SELECTOR, timeout=30000)
+
+
+def report_and_process_uploads(upload_results, process_resumes=True):
+    """Print the S3 upload summary and queue the uploaded resumes for the processing services."""
+    total_uploaded = sum(result['total_uploaded'] for result in upload_results)
+    total_failed = sum(result['total_failed'] for result in upload_results)
+
+    print(f"\n=== S3 Upload Summary ===")
+    print(f"Jobs processed: {len(upload_results)}")
+    print(f"Total files uploaded: {total_uploaded}")
+    print(f"Total files already in S3: {sum(result.get('total_skipped', 0) for result in upload_results)}")
+    print(f"Total files failed: {total_failed}")
+    store_stats = get_cv_store().stats()
+    print(f"CV store: {store_stats['unique_cvs']} unique CVs for {store_stats['references']} job/section references")
+
+    uploadFolders = []
+    for result in upload_results:
+        folders = result.get("upload_folders", [])
+        if isinstance(folders, list):
+            uploadFolders.extend(folders)
+        else:
+            if folders:
+                uploadFolders.append(str(folders))
+        if result['total_uploaded'] > 0 or result['total_failed'] > 0:
+            print(f"  {result['job_title']}: {result['total_uploaded']} uploaded, {result['total_failed']} failed")
+
+    # Downstream calls go through the outbox so the scraper doesn't wait on them
+    outbox = Outbox()
+    gave_up = outbox.counts()["failed"]
+    if gave_up:
+        print(f"WARN: {gave_up} outbox submission(s) ran out of retries; see {OUTBOX_LOG}")
+    queued = 0
+    processing = None
+    uploaded_keys = [f["s3_key"] for result in upload_results for f in result.get("uploaded_files", [])]
+    if process_resumes and uploaded_keys:
+        processing = outbox.enqueue("ec2_process", {"keys": uploaded_keys})
+        queued += 1
+    if uploadFolders:
+        # the parser groups processed resumes, so it waits for this run's processing
+        outbox.enqueue("resume_parser", {"ids": [str(obj_id) for obj_id in uploadFolders]}, depends_on=processing)
+        queued += 1
+
+    if queued:
+        print(f"Queued {queued} downstream submission(s) in the outbox.")
+        if OUTBOX_SPAWN_DRAINER:
+            project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            log_path = os.path.join(project_dir, OUTBOX_LOG)
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            with open(log_path, "a") as log:
+                subprocess.Popen([sys.executable, "-u", "drain_outbox.py", "--loop"], cwd=project_dir, start_new_session=True,
+                                 stdout=log, stderr=subprocess.STDOUT)
+            print(f"Started drain_outbox.py in the background (log: {OUTBOX_LOG}).")
+        else:
+            print("Run drain_outbox.py to deliver them.")
 
 
 def cleanup_and_save(tracker, browser, upload_to_s3=True, bucket_name=None, process_resumes=True):
     """Handle cleanup, save tracking data, upload to S3, and optionally process resumes."""
     print("\nScript finished. Closing browser.")
-    tracker.save_tracker()
+    tracker.save_tracker(force=True)
     print("Tracking data saved.")
+    profile_stats.report()
+    throttle.report()
+    fingerprint_stats.report()
     
     if upload_to_s3:
-        print("\nStarting S3 upload process...")
+        print("\nWaiting for S3 uploads to finish...")
         try:
-            s3_service = S3Services(bucket_name=bucket_name)
-            upload_results = s3_service.upload_all_tmp_files_to_s3()
-            
-            total_uploaded = sum(result['total_uploaded'] for result in upload_results)
-            total_failed = sum(result['total_failed'] for result in upload_results)
-            
-            print(f"\n=== S3 Upload Summary ===")
-            print(f"Jobs processed: {len(upload_results)}")
-            print(f"Total files uploaded: {total_uploaded}")
-            print(f"Total files failed: {total_failed}")
-            
-            uploadFolders = []
-            for result in upload_results:
-                folders = result.get("upload_folders", [])
-                if isinstance(folders, list):
-                    uploadFolders.extend(folders)
-                else:
-                    if folders:
-                        uploadFolders.append(str(folders))
-                if result['total_uploaded'] > 0 or result['total_failed'] > 0:
-                    print(f"  {result['job_title']}: {result['total_uploaded']} uploaded, {result['total_failed']} failed")
-            
-            # Process uploaded resumes if requested and files were uploaded
-            if process_resumes and total_uploaded > 0:
-                try:
-                    from services.ec2endpoint import mfjendpoint
-                    endpoint = mfjendpoint()
-                    result = endpoint.process_recent_resumes(hours_back=1)
-                    print(f"Resumes processed: {result.get('processed_count', 0)}")
-                except Exception as e:
-                    print(f"Resume processing failed: {e}")
-            
-            if uploadFolders:
-                try:
-                    json_serializable_ids = [str(obj_id) for obj_id in uploadFolders]
-                    
-                    response = requests.post(
-                        f"{RESUME_PARSER_URL}/mfj-job-processer?mode=group&max_batch=1000",
-                        headers={
-                            "accept": "application/json",
-                            "Content-Type": "application/json",
-                        },
-                        json={"ids": json_serializable_ids},  # wrap in dict
-                        timeout=10,
-                    )
-                    response.raise_for_status()
-                    print("Posted successfully:", response.json())
-                except requests.RequestException as e:
-                    print("Error posting to resume parser:", e)
-            
-            if os.path.exists("tmp"):
+            upload_results = uploader.drain(bucket_name)
+            report_and_process_uploads(upload_results, process_resumes=process_resumes)
+
+            # Anything that failed to upload stays in tmp/ for the next run
+            if os.path.exists("tmp") and not any(result["total_failed"] for result in upload_results):
                 shutil.rmtree("tmp")
                 print("Temporary files cleaned up.")
 
         except Exception as e:
             print(f"ERROR: S3 upload failed: {e}")
     
-    browser.close()
+    if browser is not None:
+        browser.close()
@@ -0,0 +1,425 @@
+from config.settings import MYFUTUREJOBS_PASS, MYFUTUREJOBS_USER, MYFUTUREJOBS_URL, CV_FETCH_ENABLED, ZERO_DISK_UPLOAD
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from services.playwright import store_cv, store_cv_buffer, fetch_cv, get_section_dir, get_section_start_positions, tracker, is_api_response
+from services.playwright import save_resume_point, section_unchanged, plan_row_download, record_section_scan, finish_vacancy, known_vacancy_urls, search_card_matches
+from services.playwright import JOB_CARD_SELECTOR, SEARCH_INPUT_SELECTOR, TABLE_ROW_SELECTOR, VACANCY_SECTIONS_SELECTOR, SEARCH_RESPONSE_PATTERN
+from services.cv_fetch import CvFetcher
+from services.cv_buffer import CvBuffer
+from services.harvest import TableHarvester, read_page_records_async, SECTION_PATTERNS
+from services.throttle import throttle
+from services.session import cookies_valid, save_storage_state_async, keep_session_fresh_async, PROFILE_BUTTON_SELECTOR, PORTAL_HOME_URL
+import asyncio
+import time
+
+
+async def login_to_portal(page):
+    """
+    Log into MyFutureJob portal
+    """
+    print("Navigating to login page...")
+    await page.goto(MYFUTUREJOBS_URL)
+    await page.fill('input[name="username"]', MYFUTUREJOBS_USER)
+    await page.fill('input[name="password"]', MYFUTUREJOBS_PASS)
+    await page.click('input[name="login"]')
+    await page.wait_for_selector(PROFILE_BUTTON_SELECTOR, timeout=60000)
+    await save_storage_state_async(page.context)
+
+
+async def ensure_logged_in(page):
+    """Async version of services.playwright.ensure_logged_in."""
+    if cookies_valid(await page.context.cookies()):
+        await page.goto(PORTAL_HOME_URL)
+        if await is_logged_in(page):
+            print("Reusing saved portal session.")
+            return
+    await login_to_portal(page)
+
+
+async def click_and_wait_for_response(page, locator, pattern, action, timeout=30000):
+    """Async version of services.playwright.click_and_wait_for_response."""
+    try:
+        async with page.expect_response(lambda r: is_api_response(r, pattern), timeout=timeout):
+            await locator.click()
+        throttle.success()
+        return True
+    except PlaywrightTimeoutError:
+        print(f"    WARN: no matching response after {action}; waiting for the page to settle…")
+        throttle.failure()
+        try:
+            await page.wait_for_load_state("networkidle", timeout=10000)
+        except PlaywrightTimeoutError:
+            pass
+        return False
+
+
+async def is_logged_in(page):
+    """Async version of services.playwright.is_logged_in."""
+    try:
+        if not cookies_valid(await page.context.cookies()):
+            return False
+        profile_button = page.locator(PROFILE_BUTTON_SELECTOR)
+        if await profile_button.is_visible():
+            return True
+        await profile_button.wait_for(state="visible", timeout=1500)
+        return True
+    except Exception as e:
+        print(f"Error checking login status: {e}")
+        return False
+
+
+async def search_for_job(page, search_term):
+    """Search for a specific job using the search functionality."""
+    try:
+        print(f"Searching for job: '{search_term}'")
+        start_time = time.time()
+
+        search_input = page.locator(SEARCH_INPUT_SELECTOR).first
+        await search_input.clear()
+        await search_input.fill(search_term)
+        search_button = page.locator('[data-test="swipe-searchInputs-search"]')
+        await click_and_wait_for_response(page, search_button, SEARCH_RESPONSE_PATTERN, "search")
+        try:
+            await page.wait_for_selector(JOB_CARD_SELECTOR, timeout=10000)
+        except PlaywrightTimeoutError:
+            print("No job cards appeared for this search.")
+        await throttle.apause("search")
+
+        print(f"Search completed for: '{search_term}' in {time.time() - start_time:.2f} seconds total")
+        return True
+    except Exception as e:
+        print(f"Error during search: {e}")
+        return False
+
+
+async def _save_download(download, local_path, job_title, section_name, filename, tracker, identity=None):
+    """Async version of services.playwright.store_download, run as a task so it doesn't hold up the page."""
+    try:
+        if ZERO_DISK_UPLOAD:
+            buffer = await asyncio.to_thread(CvBuffer.from_file, await download.path())
+            await asyncio.to_thread(store_cv_buffer, buffer, job_title, section_name, filename, tracker, identity)
+        else:
+            await download.save_as(local_path)
+            await asyncio.to_thread(store_cv, local_path, job_title, section_name, filename, tracker, identity)
+        return local_path
+    except Exception as e:
+        print(f"    ERROR saving {filename}: {e}")
+        return None
+
+
+async def click_cv_download(page, row, section_name):
+    """Async version of services.playwright.click_cv_download."""
+    if section_name == "Applicants":
+        download_cell = row.locator('[data-test="swipe-table-cell--download"]').first
+        toggle = download_cell.locator('[data-test="swipe-applicantsOverview-attachments"]').first
+        try:
+            await row.scroll_into_view_if_needed()
+            await download_cell.scroll_into_view_if_needed()
+            await page.keyboard.press("Escape")
+        except Exception:
+            pass
+
+        await toggle.wait_for(state="attached", timeout=5000)
+        await toggle.click()
+        cv_item = download_cell.locator('div.dropdown-menu >> button.dropdown-item:has-text("CV")').first
+        await cv_item.wait_for(state="visible", timeout=6000)
+
+        async with page.expect_download() as di:
+            await cv_item.click()
+        try:
+            await page.keyboard.press("Escape")
+        except Exception:
+            pass
+        return await di.value
+
+    if section_name == "Possible Matches":
+        cv_cell = row.locator('[data-test="swipe-table-cell--cv"]').first
+        download_btn = cv_cell.locator('.fa-download, .fa-file-pdf-o, [data-test="swipe-download"]').first
+        if await download_btn.count() == 0:
+            download_btn = row.locator('.fa-download, .fa-file-pdf-o, [data-test="swipe-download"]').first
+        if await download_btn.count() == 0:
+            return None
+
+        try:
+            await row.scroll_into_view_if_needed()
+            await cv_cell.scroll_into_view_if_needed()
+        except Exception:
+            pass
+
+        async with page.expect_download() as di:
+            await download_btn.click(force=True)
+        return await di.value
+
+    return None
+
+
+async def finish_pending_fetches(page, rows, pending_fetches, section_name, job_title, tracker):
+    """Async version of services.playwright.finish_pending_fetches. Returns the number of rows that failed."""
+    failed = 0
+    for i, filename, identity, local_path, future in pending_fetches:
+        try:
+            await future
+        except Exception as e:
+            print(f"    WARN: direct fetch failed for row {i+1} ({e}); using the download menu instead")
+            try:
+                d = await click_cv_download(page, rows.nth(i), section_name)
+                if d is None:
+                    print(f"    No download button found in row {i+1}, skipping…")
+                    failed += 1
+                    continue
+                if await _save_download(d, local_path, job_title, section_name, filename, tracker, identity) is None:
+                    failed += 1
+            except Exception as click_error:
+                print(f"    ERROR row {i+1}: {click_error}")
+                failed += 1
+                try: await page.keyboard.press("Escape")
+                except Exception: pass
+    pending_fetches.clear()
+    return failed
+
+
+async def download_cvs_from_section(page, section_name, section_selector, job_title, download_index_start, job_index, start_page=1, start_row=0, tracker=tracker, worker=None):
+    """
+    Async version of services.playwright.download_cvs_from_section.
+    Saves run as background tasks so the page moves on to the next row while files are written.
+    """
+    print(f"\n[+] Checking for '{section_name}' section...")
+    section_dir = get_section_dir(job_title, section_name)
+
+    section = page.locator(section_selector)
+    if await section.count() == 0 or not await section.is_visible():
+        print(f"[-] Section '{section_name}' not found or not visible. Skipping.")
+        return download_index_start, 0
+
+    download_index = download_index_start
+    current_page_num = 1
+    failed_rows = 0
+    skipped = False
+    found_rows = False
+    saves = []
+    pending_fetches = []
+    fetcher = None
+    if CV_FETCH_ENABLED:
+        fetcher = CvFetcher(await page.context.cookies(), user_agent=await page.evaluate("navigator.userAgent"))
+
+    while True:
+        section_container = page.locator(section_selector)
+        row_start = start_row if current_page_num == start_page else 0
+        print(f"  - Scanning Page {current_page_num} in '{section_name}' for '{job_title}' (starting from row {row_start})")
+        await asyncio.to_thread(save_resume_point, tracker, job_index, job_title, section_name, current_page_num, row_start, worker)
+        try:
+            await section_container.locator(TABLE_ROW_SELECTOR).first.wait_for(state="visible", timeout=10000)
+        except PlaywrightTimeoutError:
+            print("    WARN: no table rows appeared; continuing…")
+
+        rows = section_container.locator(TABLE_ROW_SELECTOR)
+        row_count = await rows.count()
+        if row_count == 0 and current_page_num == 1:
+            print("    No rows found on this page.")
+            break
+        found_rows = True
+
+        records = await read_page_records_async(page, rows, section_name, row_count)
+
+        if current_page_num == 1 and section_unchanged(page, tracker, job_title, section_name, start_page, start_row):
+            skipped = True
+            break
+
+        for i in range(row_start, row_count):
+            await asyncio.to_thread(save_resume_point, tracker, job_index, job_title, section_name, current_page_num, i, worker)
+            await keep_session_fresh_async(page)
+            row = rows.nth(i)
+
+            try:
+                record = records[i]
+                planned = plan_row_download(record, tracker, job_title, section_name, section_dir, download_index)
+                if planned is None:
+                    continue
+                identity, filename, local_path = planned
+
+                row_tokens = record["tokens"]
+                cv_url = fetcher.resolve(row_tokens) if fetcher else None
+
+                if cv_url:
+                    future = asyncio.wrap_future(fetch_cv(fetcher, cv_url, local_path, job_title, section_name, filename, tracker, identity))
+                    pending_fetches.append((i, filename, identity, local_path, future))
+                    download_index += 1
+                else:
+                    d = await click_cv_download(page, row, section_name)
+                    if d is None:
+                        print(f"    No download button found in row {i+1} (after fallback), skipping…")
+                        failed_rows += 1
+                        continue
+                    if fetcher:
+                        fetcher.learn(d.url, row_tokens)
+
+                    saves.append(asyncio.create_task(
+                        _save_download(d, local_path, job_title, section_name, filename, tracker, identity)
+                    ))
+                    download_index += 1
+                    throttle.success()
+                    await throttle.apause("cv")
+
+                if download_index > 10:
+                    print(f"⚠️ Reached hard limit of 1500 downloads in '{section_name}'. Stopping.")
+                    failed_rows += await finish_pending_fetches(page, rows, pending_fetches, section_name, job_title, tracker)
+                    failed_rows += sum(1 for saved in await asyncio.gather(*saves) if saved is None)
+                    if fetcher:
+                        await asyncio.to_thread(fetcher.close)
+                    return download_index, failed_rows
+
+            except PlaywrightTimeoutError:
+                print(f"    WARN: Timeout while processing row {i+1}.")
+                failed_rows += 1
+                throttle.failure()
+                try: await page.keyboard.press("Escape")
+                except Exception: pass
+            except Exception as e:
+                print(f"    ERROR row {i+1}: {e}")
+                failed_rows += 1
+                throttle.failure()
+                try: await page.keyboard.press("Escape")
+                except Exception: pass
+
+        failed_rows += await finish_pending_fetches(page, rows, pending_fetches, section_name, job_title, tracker)
+
+        pagination = section_container.locator("ul.pagination")
+        if await pagination.count() == 0:
+            print(f"  - Finished all pages for '{section_name}'.")
+            break
+
+        next_btn = pagination.locator(
+            'li.page-item:not(.disabled) a[aria-label="Next"], '
+            'li.page-item:not(.disabled) a:has-text("»")'
+        ).first
+        if await next_btn.count() and await next_btn.is_visible():
+            print("    Navigating to next page via Next…")
+            await click_and_wait_for_response(page, next_btn, SECTION_PATTERNS[section_name], "next page")
+            current_page_num += 1
+            continue
+
+        next_number = str(current_page_num + 1)
+        next_link = pagination.locator(f'li.page-item a.page-link:has-text("{next_number}")').first
+        if not (await next_link.count() and await next_link.is_visible()):
+            print(f"  - Finished all pages for '{section_name}'.")
+            break
+
+        print(f"    Navigating to page {next_number}…")
+        await click_and_wait_for_response(page, next_link, SECTION_PATTERNS[section_name], f"page {next_number}")
+        current_page_num += 1
+
+    # _save_download returns None for a CV it couldn't store
+    failed_rows += sum(1 for saved in await asyncio.gather(*saves) if saved is None)
+    if fetcher:
+        await asyncio.to_thread(fetcher.close)
+    record_section_scan(page, tracker, job_title, section_name, found_rows and not skipped and not failed_rows)
+    return download_index, failed_rows
+
+
+async def open_vacancy(page, url):
+    """Async version of services.playwright.open_vacancy."""
+    TableHarvester.for_page(page).reset()
+    try:
+        await page.goto(url)
+        await page.wait_for_selector(VACANCY_SECTIONS_SELECTOR, timeout=30000)
+    except PlaywrightTimeoutError:
+        print(f"WARN: vacancy sections did not appear at {url}")
+        throttle.failure()
+        return False
+    throttle.success()
+    return True
+
+
+async def scrape_vacancy(page, job_title, job_index, tracker=tracker, worker=None):
+    """Async version of services.playwright.scrape_vacancy."""
+    (applicants_start_page, applicants_start_row), (possible_matches_start_page, possible_matches_start_row) = \
+        get_section_start_positions(tracker, job_title)
+
+    download_index_counter, applicants_failed = await download_cvs_from_section(
+        page, "Applicants", "#applicants", job_title, 1, job_index,
+        applicants_start_page, applicants_start_row, tracker=tracker, worker=worker
+    )
+    _, matches_failed = await download_cvs_from_section(
+        page, "Possible Matches", "#matchedJobseekers", job_title, download_index_counter, job_index,
+        possible_matches_start_page, possible_matches_start_row, tracker=tracker, worker=worker
+    )
+
+    return finish_vacancy(tracker, job_title, applicants_failed + matches_failed)
+
+
+async def open_known_vacancy(page, sheet_job, tracker=tracker):
+    """Async version of services.playwright.open_known_vacancy."""
+    title, urls, indexed = known_vacancy_urls(sheet_job, tracker)
+    for url in urls:
+        if await open_vacancy(page, url):
+            if url != sheet_job.get("link"):
+                print(f"Opened '{title}' from the vacancy index")
+            return title
+    if indexed:
+        await asyncio.to_thread(tracker.forget_vacancy, sheet_job["job"])
+    return None
+
+
+async def process_job(page, sheet_job, job_index, tracker=tracker, worker=None):
+    """Async version of services.playwright.process_job."""
+    job = sheet_job["job"]
+    job_title = await open_known_vacancy(page, sheet_job, tracker=tracker)
+    if job_title:
+        print(f"\nProcessing Job: {job_title}")
+        if not await scrape_vacancy(page, job_title, job_index, tracker=tracker, worker=worker):
+            return None
+        print(f"Completed processing: {job_title}")
+        return job_title
+
+    print(f"No working link for '{job}', searching for it")
+    if await page.locator(SEARCH_INPUT_SELECTOR).count() == 0:
+        await page.goto(PORTAL_HOME_URL)
+        await page.wait_for_selector(SEARCH_INPUT_SELECTOR, timeout=30000)
+    await search_for_job(page, job)
+    job_title = await process_search_results(page, job, job_index, tracker=tracker, worker=worker)
+    await navigate_back_to_listings(page)
+    return job_title
+
+
+async def process_search_results(page, job_query, job_index, tracker=tracker, worker=None):
+    """Async version of services.playwright.process_search_results."""
+    job_cards = page.locator(JOB_CARD_SELECTOR)
+
+    for i in range(await job_cards.count()):
+        job = job_cards.nth(i)
+        await job.scroll_into_view_if_needed()
+        job_title = (await job.locator('h5.font-size-big').inner_text()).strip()
+        expired = await job.locator('h5.font-size-big span.text-decoration-line-through').count() > 0
+        if not await asyncio.to_thread(search_card_matches, job_title, expired, job_query, tracker):
+            continue
+
+        TableHarvester.for_page(page).reset()
+        await job.click()
+        print(f"\nProcessing Job: {job_title}")
+        try:
+            await page.wait_for_selector(VACANCY_SECTIONS_SELECTOR, timeout=30000)
+            throttle.success()
+            await asyncio.to_thread(tracker.remember_vacancy, job_title, page.url)
+        except PlaywrightTimeoutError:
+            print("WARN: vacancy sections did not appear; continuing…")
+            throttle.failure()
+
+        if not await scrape_vacancy(page, job_title, job_index, tracker=tracker, worker=worker):
+            return None
+        print(f"Completed processing: {job_title}")
+        return job_title
+
+    print(f"No search result matched '{job_query}'")
+    return None
+
+
+async def navigate_back_to_listings(page):
+    """Navigate back to the job listings page after processing a job."""
+    try:
+        await page.go_back()
+        await page.wait_for_selector(JOB_CARD_SELECTOR, timeout=60000)
+    except Exception as nav_error:
+        print(f"    Warning: Navigation back failed: {nav_error}")
+        print("    Attempting to reload the main page...")
+        throttle.failure()
+        await page.goto(MYFUTUREJOBS_URL.replace('/auth/', '/'))
+        await page.wait_for_selector(JOB_CARD_SELECTOR, timeout=30000)
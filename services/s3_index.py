@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+import json
+import threading
+import uuid
+
+INDEX_PREFIX = "index/"
+FLUSH_EVERY = 50
+
+
+def day_prefix(date):
+    """Where a day's index objects live: one per flush, from every runner."""
+    return f"{INDEX_PREFIX}{date}/"
+
+
+def legacy_index_key(date):
+    """The single whole-day object earlier versions rewrote on every flush; still read."""
+    return f"{INDEX_PREFIX}{date}.jsonl"
+
+
+def window_days(hours_back, now=None):
+    """Every YYYY-MM-DD partition the last `hours_back` hours touch, oldest first."""
+    now = now or datetime.now()
+    days = []
+    day = (now - timedelta(hours=hours_back)).date()
+    while day <= now.date():
+        days.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=1)
+    return days
+
+
+class S3DailyIndex:
+    """
+    Per-day index of uploaded resumes under index/<YYYY-MM-DD>/ in the bucket,
+    one JSON line per uploaded key ({"key", "sha256", "size", "job_folder",
+    "job_title", "section", "uploaded_at"}), keyed by the key's date partition.
+
+    Entries are batched and each flush writes a new object,
+    index/<day>/<runner>-<seq>.jsonl, so nothing is ever re-read or rewritten and
+    concurrent runners can't overwrite each other. Readers list the day's
+    objects and merge them, whichever runner made them.
+    """
+
+    def __init__(self, s3, bucket_name, flush_every=FLUSH_EVERY):
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.pending = []
+        self.runner = uuid.uuid4().hex[:12]
+        self.seq = 0
+
+    def add(self, s3_key, sha256, size, job_title=None):
+        """Queue an uploaded job/section key for the index; flushes every `flush_every` entries."""
+        date, job_folder, section = s3_key.split("/")[:3]
+        entry = {
+            "key": s3_key,
+            "sha256": sha256,
+            "size": size,
+            "job_folder": job_folder,
+            "job_title": job_title or job_folder,
+            "section": section,
+            "uploaded_at": datetime.now(timezone.utc).isoformat(),
+            "date": date,
+        }
+        with self.lock:
+            self.pending.append(entry)
+            full = len(self.pending) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write queued entries out, one new object per day. Entries that fail stay queued for the next flush."""
+        from botocore.exceptions import BotoCoreError, ClientError
+        with self.lock:
+            pending, self.pending = self.pending, []
+        by_date = {}
+        for entry in pending:
+            by_date.setdefault(entry.pop("date"), []).append(entry)
+        for date, entries in by_date.items():
+            try:
+                self._put(date, entries)
+            except (BotoCoreError, ClientError) as e:
+                print(f"WARN: could not write to {day_prefix(date)}: {e}")
+                with self.lock:
+                    self.pending.extend(dict(entry, date=date) for entry in entries)
+
+    def _put(self, date, entries):
+        with self.lock:
+            self.seq += 1
+            key = f"{day_prefix(date)}{self.runner}-{self.seq:06d}.jsonl"
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=lines, ContentType="application/x-ndjson")
+
+    def _get(self, key):
+        """An object's body, or None if it doesn't exist."""
+        from botocore.exceptions import ClientError
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def read(self, date):
+        """A day's index entries, or None if that day has no index objects."""
+        paginator = self.s3.get_paginator("list_objects_v2")
+        keys = [
+            obj["Key"]
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=day_prefix(date))
+            for obj in page.get("Contents", [])
+        ]
+        legacy = self._get(legacy_index_key(date))
+        if legacy is None and not keys:
+            return None
+        bodies = [legacy or b""] + [self._get(key) or b"" for key in keys]
+        entries = []
+        for body in bodies:
+            for line in body.decode("utf-8").splitlines():
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+
+    def job_titles(self, dates):
+        """Titles of the jobs with uploads on any of the given days (older entries only know the folder)."""
+        titles = set()
+        for date in dates:
+            for entry in self.read(date) or []:
+                titles.add(entry.get("job_title") or entry.get("job_folder"))
+        titles.discard(None)
+        return sorted(titles)
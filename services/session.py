@@ -0,0 +1,123 @@
+from config.settings import MYFUTUREJOBS_URL, SESSION_REFRESH_INTERVAL
+from urllib.parse import urlparse
+import json
+import os
+import threading
+import time
+import weakref
+
+AUTH_STATE_FILE = os.path.join("data", "auth_state.json")
+PROFILE_BUTTON_SELECTOR = '[data-test="swipe-navbarUser-profile"]'
+PORTAL_HOME_URL = MYFUTUREJOBS_URL.replace('/auth/', '/') if MYFUTUREJOBS_URL else None
+
+_state_lock = threading.Lock()
+_last_refresh = weakref.WeakKeyDictionary()
+
+
+def _applies_to_portal(cookie):
+    """True if the browser would send this cookie to the portal host."""
+    host = urlparse(MYFUTUREJOBS_URL or "").hostname or ""
+    domain = cookie.get("domain", "").lstrip(".")
+    return bool(domain) and (host == domain or host.endswith("." + domain))
+
+
+def cookies_valid(cookies, margin=60):
+    """
+    True if the portal cookies are present and none of them expire within `margin` seconds.
+    Session cookies (expires == -1) count as valid.
+    """
+    portal_cookies = [c for c in cookies if _applies_to_portal(c)]
+    if not portal_cookies:
+        return False
+    now = time.time()
+    return all(c.get("expires", -1) == -1 or c["expires"] > now + margin for c in portal_cookies)
+
+
+def load_storage_state(path=AUTH_STATE_FILE):
+    """Return the saved storage_state path if its cookies are still usable, else None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except Exception:
+        return None
+    return path if cookies_valid(state.get("cookies", [])) else None
+
+
+def save_storage_state(context, path=AUTH_STATE_FILE):
+    """Persist the context's cookies/local storage so later runs and other workers can skip login."""
+    with _state_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        context.storage_state(path=tmp_path)
+        os.replace(tmp_path, path)
+
+
+async def save_storage_state_async(context, path=AUTH_STATE_FILE):
+    """Async version of save_storage_state."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{id(context)}.tmp"
+    await context.storage_state(path=tmp_path)
+    with _state_lock:
+        os.replace(tmp_path, path)
+
+
+def keep_session_alive(page):
+    """Register some user activity so the portal's inactivity timer doesn't log us out."""
+    try:
+        page.mouse.move(5, 5)
+        page.locator(PROFILE_BUTTON_SELECTOR).hover(timeout=2000)
+        page.mouse.move(10, 10)
+    except Exception as e:
+        print(f"Could not refresh session activity: {e}")
+
+
+def keep_session_fresh(page, interval=SESSION_REFRESH_INTERVAL):
+    """
+    Called from the scraping loop: every `interval` seconds, touch the page so the
+    session stays active, and re-save the storage state in case cookies rotated.
+    """
+    now = time.monotonic()
+    last = _last_refresh.get(page)
+    if last is None:
+        _last_refresh[page] = now
+        return
+    if now - last < interval:
+        return
+    _last_refresh[page] = now
+    keep_session_alive(page)
+    try:
+        save_storage_state(page.context)
+    except Exception as e:
+        print(f"Could not save session state: {e}")
+
+
+async def keep_session_alive_async(page):
+    """Async version of keep_session_alive."""
+    try:
+        await page.mouse.move(5, 5)
+        await page.locator(PROFILE_BUTTON_SELECTOR).hover(timeout=2000)
+        await page.mouse.move(10, 10)
+    except Exception as e:
+        print(f"Could not refresh session activity: {e}")
+
+
+async def keep_session_fresh_async(page, interval=SESSION_REFRESH_INTERVAL):
+    """
+    Async version of keep_session_fresh, called between rows so the hover never
+    lands while a row's download menu is open.
+    """
+    now = time.monotonic()
+    last = _last_refresh.get(page)
+    if last is None:
+        _last_refresh[page] = now
+        return
+    if now - last < interval:
+        return
+    _last_refresh[page] = now
+    await keep_session_alive_async(page)
+    try:
+        await save_storage_state_async(page.context)
+    except Exception as e:
+        print(f"Could not save session state: {e}")
@@ -0,0 +1,80 @@
+from config.settings import THROTTLE_BASE_DELAY, THROTTLE_MIN_DELAY, THROTTLE_MAX_DELAY
+import asyncio
+import json
+import os
+import threading
+import time
+
+THROTTLE_LOG_FILE = os.path.join("data", "throttle_log.jsonl")
+
+
+class AdaptiveThrottle:
+    """
+    Chooses the pause between portal actions.
+
+    Timeouts and errors multiply the delay by `backoff` (up to max_delay); every
+    healthy action multiplies it by `recovery` (down to min_delay). Each pause is
+    recorded with its action name so runs can be compared and the bounds tuned.
+    One throttle is shared by all workers since the portal pushes back on all of them.
+    """
+
+    def __init__(self, base_delay=THROTTLE_BASE_DELAY, min_delay=THROTTLE_MIN_DELAY, max_delay=THROTTLE_MAX_DELAY,
+                 backoff=2.0, recovery=0.85, log_file=THROTTLE_LOG_FILE):
+        self.delay = base_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.recovery = recovery
+        self.log_file = log_file
+        self.lock = threading.Lock()
+        self.history = []
+
+    def success(self):
+        """The portal answered promptly; speed up."""
+        with self.lock:
+            self.delay = max(self.min_delay, self.delay * self.recovery)
+
+    def failure(self):
+        """A timeout or error; slow down."""
+        with self.lock:
+            self.delay = min(self.max_delay, self.delay * self.backoff)
+
+    def next_delay(self, action):
+        with self.lock:
+            delay = self.delay
+            self.history.append({"at": time.time(), "action": action, "delay": round(delay, 3)})
+        return delay
+
+    def pause(self, action):
+        """Sleep for the current delay and record it."""
+        time.sleep(self.next_delay(action))
+
+    async def apause(self, action):
+        """Async version of pause."""
+        await asyncio.sleep(self.next_delay(action))
+
+    def report(self):
+        """Print per-action delay stats and append this run's pauses to the throttle log."""
+        with self.lock:
+            history = list(self.history)
+            self.history.clear()
+        if not history:
+            return {}
+
+        stats = {}
+        for entry in history:
+            stats.setdefault(entry["action"], []).append(entry["delay"])
+
+        print("\n=== Throttle Summary ===")
+        for action, delays in stats.items():
+            print(f"  {action}: {len(delays)} pauses, avg {sum(delays) / len(delays):.2f}s "
+                  f"(min {min(delays):.2f}s, max {max(delays):.2f}s), total {sum(delays):.0f}s")
+
+        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+        with open(self.log_file, "a") as f:
+            for entry in history:
+                f.write(json.dumps(entry) + "\n")
+        return stats
+
+
+throttle = AdaptiveThrottle()
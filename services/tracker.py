@@ -1,66 +1,352 @@
 import json
 import os
+import re
+import sqlite3
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from config.settings import TRACKER_BACKEND, TRACKER_CHECKPOINT_INTERVAL
 
-class ScrapingTracker:
-    def __init__(self, tracker_file="data/scraping_tracker.json"):
+
+# job info keys holding each section's applicant total from its last full scan
+SECTION_COUNT_KEYS = {"Applicants": "applicant_count", "Possible Matches": "matches_count"}
+
+
+def normalize_title(title):
+    """Lower-case a job title and collapse whitespace so titles compare reliably."""
+    return ' '.join(title.lower().split())
+
+
+def vacancy_id_from_url(url):
+    """The vacancy id in a portal vacancy URL: its last all-digit path segment, if any."""
+    ids = re.findall(r'/(\d+)(?=/|$|\?|#)', url or "")
+    return ids[-1] if ids else None
+
+
+class JsonTrackerBackend:
+    """Original storage: the whole tracker rewritten to one JSON file on every save."""
+
+    def __init__(self, tracker_file):
         self.tracker_file = tracker_file
-        self.data = self.load_tracker()
-    
-    def load_tracker(self):
-        """Load existing tracking data or create new structure"""
+        self.downloaded_files = set()
+        self.applicants = set()
+        self.vacancies = {}
+
+    def load(self):
+        data = None
         if os.path.exists(self.tracker_file):
             try:
                 with open(self.tracker_file, 'r') as f:
-                    return json.load(f)
+                    data = json.load(f)
             except:
                 pass
-        
-        return {
-            "last_full_scan": None,
-            "jobs": {},
-            "downloaded_files": set(),
-            "resume_state": None
-        }
-    
-    def save_tracker(self):
-        """Save tracking data to file"""
+        data = data or {"last_full_scan": None, "jobs": {}, "downloaded_files": [], "resume_state": None}
+        self.downloaded_files = set(data.pop("downloaded_files", []))
+        self.applicants = set(data.pop("downloaded_applicants", []))
+        self.vacancies = data.pop("vacancies", {})
+        return data
+
+    def save(self, data, dirty_jobs, removed_jobs):
         # Convert set to list for JSON serialization
-        data_to_save = self.data.copy()
-        data_to_save["downloaded_files"] = list(self.data["downloaded_files"])
-        
+        data_to_save = data.copy()
+        data_to_save["downloaded_files"] = list(self.downloaded_files)
+        data_to_save["downloaded_applicants"] = list(self.applicants)
+        data_to_save["vacancies"] = self.vacancies
+
         with open(self.tracker_file, 'w') as f:
             json.dump(data_to_save, f, indent=2)
+
+    def has_file(self, file_key):
+        return file_key in self.downloaded_files
+
+    def add_file(self, file_key, job_title, section_name, filename):
+        self.downloaded_files.add(file_key)
+
+    def has_applicant(self, job_title, section_name, identity):
+        return f"{job_title}|{section_name}|{identity}" in self.applicants
+
+    def add_applicant(self, job_title, section_name, identity, filename):
+        self.applicants.add(f"{job_title}|{section_name}|{identity}")
+
+    def get_vacancy(self, title_key):
+        return self.vacancies.get(title_key)
+
+    def set_vacancy(self, title_key, job_title, url, vacancy_id):
+        self.vacancies[title_key] = {"job_title": job_title, "url": url, "id": vacancy_id,
+                                     "resolved_at": datetime.now().isoformat()}
+
+    def remove_vacancy(self, title_key):
+        self.vacancies.pop(title_key, None)
+
+
+class SqliteTrackerBackend:
+    """
+    SQLite (WAL) storage. Downloaded files are indexed rows written as they happen,
+    so a save only touches the jobs and resume state that changed, and a crash can't
+    leave a half-written file behind. An existing JSON tracker is imported on first use.
+    """
+
+    def __init__(self, db_file, legacy_json_file=None):
+        self.db_file = db_file
+        self.legacy_json_file = legacy_json_file
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS downloaded_files (
+                    file_key TEXT PRIMARY KEY,
+                    job_title TEXT,
+                    section_name TEXT,
+                    filename TEXT,
+                    downloaded_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_downloaded_files_job ON downloaded_files (job_title, section_name);
+                CREATE TABLE IF NOT EXISTS downloaded_applicants (
+                    job_title TEXT,
+                    section_name TEXT,
+                    identity TEXT,
+                    filename TEXT,
+                    downloaded_at TEXT,
+                    PRIMARY KEY (job_title, section_name, identity)
+                );
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_title TEXT PRIMARY KEY,
+                    last_processed TEXT,
+                    info TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_last_processed ON jobs (last_processed);
+                CREATE TABLE IF NOT EXISTS vacancies (
+                    title_key TEXT PRIMARY KEY,
+                    job_title TEXT,
+                    url TEXT,
+                    vacancy_id TEXT,
+                    resolved_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+        self._migrate_json()
+
+    def _migrate_json(self):
+        """Import the old JSON tracker once, then remember that it was imported."""
+        if not self.legacy_json_file or not os.path.exists(self.legacy_json_file):
+            return
+        if self.conn.execute("SELECT 1 FROM state WHERE key = 'migrated_from_json'").fetchone():
+            return
+        try:
+            with open(self.legacy_json_file, 'r') as f:
+                legacy = json.load(f)
+        except Exception as e:
+            print(f"Could not read {self.legacy_json_file} for migration: {e}")
+            return
+
+        with self.conn:
+            for file_key in legacy.get("downloaded_files", []):
+                job_title, section_name, filename = (file_key.split("|", 2) + ["", ""])[:3]
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO downloaded_files VALUES (?, ?, ?, ?, NULL)",
+                    (file_key, job_title, section_name, filename),
+                )
+            for applicant_key in legacy.get("downloaded_applicants", []):
+                job_title, section_name, identity = (applicant_key.split("|", 2) + ["", ""])[:3]
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO downloaded_applicants VALUES (?, ?, ?, NULL, NULL)",
+                    (job_title, section_name, identity),
+                )
+            for job_title, info in legacy.get("jobs", {}).items():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)",
+                    (job_title, info.get("last_processed"), json.dumps(info)),
+                )
+            for title_key, vacancy in legacy.get("vacancies", {}).items():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO vacancies VALUES (?, ?, ?, ?, ?)",
+                    (title_key, vacancy.get("job_title"), vacancy.get("url"), vacancy.get("id"), vacancy.get("resolved_at")),
+                )
+            for key in ("last_full_scan", "resume_state", "worker_resume_states"):
+                if legacy.get(key) is not None:
+                    self.conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(legacy[key])))
+            self.conn.execute("INSERT OR REPLACE INTO state VALUES ('migrated_from_json', ?)", (datetime.now().isoformat(),))
+        print(f"Migrated tracker data from {self.legacy_json_file} to {self.db_file}")
+
+    def load(self):
+        data = {"last_full_scan": None, "jobs": {}, "resume_state": None, "worker_resume_states": {}}
+        for job_title, info in self.conn.execute("SELECT job_title, info FROM jobs"):
+            data["jobs"][job_title] = json.loads(info)
+        for key, value in self.conn.execute("SELECT key, value FROM state WHERE key IN ('last_full_scan', 'resume_state', 'worker_resume_states')"):
+            data[key] = json.loads(value)
+        return data
+
+    def save(self, data, dirty_jobs, removed_jobs):
+        with self.conn:
+            for job_title in dirty_jobs:
+                info = data["jobs"].get(job_title)
+                if info is not None:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)",
+                        (job_title, info.get("last_processed"), json.dumps(info)),
+                    )
+            for job_title in removed_jobs:
+                self.conn.execute("DELETE FROM jobs WHERE job_title = ?", (job_title,))
+            for key in ("last_full_scan", "resume_state", "worker_resume_states"):
+                self.conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(data.get(key))))
+
+    def has_file(self, file_key):
+        return self.conn.execute("SELECT 1 FROM downloaded_files WHERE file_key = ?", (file_key,)).fetchone() is not None
+
+    def add_file(self, file_key, job_title, section_name, filename):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO downloaded_files VALUES (?, ?, ?, ?, ?)",
+                (file_key, job_title, section_name, filename, datetime.now().isoformat()),
+            )
+
+    def has_applicant(self, job_title, section_name, identity):
+        return self.conn.execute(
+            "SELECT 1 FROM downloaded_applicants WHERE job_title = ? AND section_name = ? AND identity = ?",
+            (job_title, section_name, identity),
+        ).fetchone() is not None
+
+    def add_applicant(self, job_title, section_name, identity, filename):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO downloaded_applicants VALUES (?, ?, ?, ?, ?)",
+                (job_title, section_name, identity, filename, datetime.now().isoformat()),
+            )
+
+    def get_vacancy(self, title_key):
+        row = self.conn.execute(
+            "SELECT job_title, url, vacancy_id, resolved_at FROM vacancies WHERE title_key = ?", (title_key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"job_title": row[0], "url": row[1], "id": row[2], "resolved_at": row[3]}
+
+    def set_vacancy(self, title_key, job_title, url, vacancy_id):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO vacancies VALUES (?, ?, ?, ?, ?)",
+                (title_key, job_title, url, vacancy_id, datetime.now().isoformat()),
+            )
+
+    def remove_vacancy(self, title_key):
+        with self.conn:
+            self.conn.execute("DELETE FROM vacancies WHERE title_key = ?", (title_key,))
+
+
+class ScrapingTracker:
+    def __init__(self, tracker_file="data/scraping_tracker.json", backend=None, checkpoint_interval=TRACKER_CHECKPOINT_INTERVAL):
+        self.tracker_file = tracker_file
+        self.lock = threading.RLock()
+        if backend is None:
+            if TRACKER_BACKEND == "json":
+                backend = JsonTrackerBackend(tracker_file)
+            else:
+                backend = SqliteTrackerBackend(os.path.splitext(tracker_file)[0] + ".db", legacy_json_file=tracker_file)
+        self.backend = backend
+        self.checkpoint_interval = checkpoint_interval
+        self._dirty_jobs = set()
+        self._removed_jobs = set()
+        self._state_dirty = False
+        # downloaded files, applicants and vacancies changed since the last save
+        self._files_dirty = False
+        self._last_checkpoint = float("-inf")
+        self.data = self.load_tracker()
+    
+    def load_tracker(self):
+        """Load existing tracking data or create new structure"""
+        with self.lock:
+            return self.backend.load()
+    
+    def save_tracker(self, force=False):
+        """
+        Save tracking data. Resume-state and downloaded-file updates are coalesced: they
+        are written at most once per checkpoint interval unless forced; job changes are
+        always written.
+        """
+        with self.lock:
+            now = time.monotonic()
+            state_due = ((self._state_dirty or self._files_dirty)
+                         and (force or now - self._last_checkpoint >= self.checkpoint_interval))
+            if not (state_due or self._dirty_jobs or self._removed_jobs):
+                return
+            self.backend.save(self.data, self._dirty_jobs, self._removed_jobs)
+            self._dirty_jobs.clear()
+            self._removed_jobs.clear()
+            self._state_dirty = False
+            self._files_dirty = False
+            self._last_checkpoint = now
     
     def is_file_downloaded(self, job_title, section_name, filename):
         """Check if a file has already been downloaded"""
         file_key = f"{job_title}|{section_name}|{filename}"
-        return file_key in self.data["downloaded_files"]
+        with self.lock:
+            return self.backend.has_file(file_key)
     
-    def mark_file_downloaded(self, job_title, section_name, filename):
-        """Mark a file as downloaded"""
+    def mark_file_downloaded(self, job_title, section_name, filename, identity=None):
+        """Mark a file as downloaded (and the applicant it came from, when known)"""
         file_key = f"{job_title}|{section_name}|{filename}"
-        
-        # Convert to set if it's a list (from JSON loading)
-        if isinstance(self.data["downloaded_files"], list):
-            self.data["downloaded_files"] = set(self.data["downloaded_files"])
-        
-        self.data["downloaded_files"].add(file_key)
+        with self.lock:
+            self.backend.add_file(file_key, job_title, section_name, filename)
+            if identity:
+                self.backend.add_applicant(job_title, section_name, identity, filename)
+            self._files_dirty = True
+
+    def is_applicant_downloaded(self, job_title, section_name, identity):
+        """Check if an applicant's CV was already downloaded, before touching the row"""
+        with self.lock:
+            return self.backend.has_applicant(job_title, section_name, identity)
     
+    def find_vacancy(self, job_title):
+        """The vacancy ({"url", "id", ...}) a search last resolved this title to, or None"""
+        with self.lock:
+            return self.backend.get_vacancy(normalize_title(job_title))
+
+    def remember_vacancy(self, job_title, url):
+        """Index the vacancy a search matched, so later runs can open it without searching"""
+        with self.lock:
+            self.backend.set_vacancy(normalize_title(job_title), job_title, url, vacancy_id_from_url(url))
+            self._files_dirty = True
+
+    def forget_vacancy(self, job_title):
+        """Drop an indexed vacancy that turned out to be expired or gone"""
+        with self.lock:
+            self.backend.remove_vacancy(normalize_title(job_title))
+            self._files_dirty = True
+
     def update_job_info(self, job_title, applicant_count=None, matches_count=None):
         """Update job information"""
-        if job_title not in self.data["jobs"]:
-            self.data["jobs"][job_title] = {}
-        
-        job_info = self.data["jobs"][job_title]
-        job_info["last_processed"] = datetime.now().isoformat()
-        
-        if applicant_count is not None:
-            job_info["applicant_count"] = applicant_count
-        if matches_count is not None:
-            job_info["matches_count"] = matches_count
+        with self.lock:
+            if job_title not in self.data["jobs"]:
+                self.data["jobs"][job_title] = {}
+
+            job_info = self.data["jobs"][job_title]
+            job_info["last_processed"] = datetime.now().isoformat()
+
+            if applicant_count is not None:
+                job_info["applicant_count"] = applicant_count
+            if matches_count is not None:
+                job_info["matches_count"] = matches_count
+            self._dirty_jobs.add(job_title)
     
+    def is_section_unchanged(self, job_title, section_name, total):
+        """True if a section still has the total it had when it was last scanned in full"""
+        if total is None:
+            return False
+        with self.lock:
+            job_info = self.data["jobs"].get(job_title) or {}
+            return job_info.get(SECTION_COUNT_KEYS[section_name]) == total
+
+    def record_section_count(self, job_title, section_name, total):
+        """Store a fully scanned section's total as its fingerprint for the next run"""
+        if total is not None:
+            self.update_job_info(job_title, **{SECTION_COUNT_KEYS[section_name]: total})
+
     def should_process_job(self, job_title, hours_threshold=24):
         """Check if a job should be processed based on last processing time"""
         if job_title not in self.data["jobs"]:
@@ -83,23 +369,79 @@ class ScrapingTracker:
             return None
         return self.data["jobs"][job_title]
     
-    def set_resume_state(self, job_index, current_job, section_name, current_page, current_row):
-        """Store the current scraping state for resuming"""
-        self.data["resume_state"] = {
+    def set_resume_state(self, job_index, current_job, section_name, current_page, current_row, worker=None):
+        """Store the current scraping state for resuming (per worker when running a pool)"""
+        state = {
             "job_index": job_index,
             "current_job": current_job,
             "section_name": section_name,
             "current_page": current_page,
             "current_row": current_row
         }
+        with self.lock:
+            if worker is None:
+                self.data["resume_state"] = state
+            else:
+                self.data.setdefault("worker_resume_states", {})[str(worker)] = state
+            self._state_dirty = True
 
-    def get_resume_state(self):
+    def get_resume_state(self, worker=None):
         """Get the stored resume state"""
-        return self.data.get("resume_state")
+        if worker is None:
+            return self.data.get("resume_state")
+        return self.data.get("worker_resume_states", {}).get(str(worker))
+
+    def find_resume_state(self, job_title):
+        """Find the resume state of whichever worker was last processing this job"""
+        # the sheet name and the portal's card title can differ in case and spacing
+        title_key = normalize_title(job_title)
+        with self.lock:
+            states = [self.data.get("resume_state")]
+            states.extend(self.data.get("worker_resume_states", {}).values())
+        for state in states:
+            if state and normalize_title(state.get("current_job") or "") == title_key:
+                return state
+        return None
+
+    def claim_resume_state(self, job_title, worker):
+        """Move a job's resume state (left by any worker) into this worker's slot"""
+        with self.lock:
+            state = self.find_resume_state(job_title)
+            if not state:
+                return None
+            if self.data.get("resume_state") is state:
+                self.data["resume_state"] = None
+            states = self.data.setdefault("worker_resume_states", {})
+            for key in [k for k, v in states.items() if v is state]:
+                del states[key]
+            states[str(worker)] = state
+            self._state_dirty = True
+            self._last_checkpoint = float("-inf")
+            return state
+
+    def release_resume_state(self, worker):
+        """
+        Hand a failed job's resume state back from the worker's slot, keyed by the job,
+        so the worker can take another job and whoever retries this one resumes it.
+        """
+        with self.lock:
+            states = self.data.setdefault("worker_resume_states", {})
+            state = states.pop(str(worker), None)
+            if state:
+                states[f"job:{normalize_title(state.get('current_job') or '')}"] = state
+            self._state_dirty = True
+            self._last_checkpoint = float("-inf")
 
-    def clear_resume_state(self):
+    def clear_resume_state(self, worker=None):
         """Clear the resume state after successful completion"""
-        self.data["resume_state"] = None
+        with self.lock:
+            if worker is None:
+                self.data["resume_state"] = None
+            else:
+                self.data.get("worker_resume_states", {}).pop(str(worker), None)
+            # make sure the next save writes this out rather than coalescing it away
+            self._state_dirty = True
+            self._last_checkpoint = float("-inf")
 
     def cleanup_old_tracking(self, days_old=30):
         """Remove tracking data older than specified days"""
@@ -114,7 +456,10 @@ class ScrapingTracker:
             except:
                 jobs_to_remove.append(job_title)
 
-        for job_title in jobs_to_remove:
-            del self.data["jobs"][job_title]
+        with self.lock:
+            for job_title in jobs_to_remove:
+                del self.data["jobs"][job_title]
+                self._removed_jobs.add(job_title)
+                self._dirty_jobs.discard(job_title)
 
         print(f"Cleaned up {len(jobs_to_remove)} old job tracking entries")
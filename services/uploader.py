@@ -0,0 +1,145 @@
+from config.settings import STREAMING_UPLOAD, UPLOAD_QUEUE_SIZE, UPLOAD_WORKERS
+from services.cv_store import get_cv_store, clean_job_title, section_folder
+from datetime import datetime
+import os
+import queue
+import threading
+
+
+class StreamingUploader:
+    """
+    Uploads CVs to S3 while the scrape is still running.
+
+    The scraper hands over every CV as soon as it is saved; a few background
+    threads attach it to its job/section in S3 and the local copy is deleted once
+    the upload is confirmed. With ZERO_DISK_UPLOAD the CV arrives as an in-memory
+    CvBuffer and never touches tmp/ unless its upload fails. The queue is bounded so a slow S3 pushes back on the
+    scraper instead of piling files up on disk. `drain()` waits for the queue,
+    retries anything that failed and returns per-job results shaped like
+    S3Services.upload_all_tmp_files_to_s3.
+    """
+
+    def __init__(self, s3_service=None, enabled=STREAMING_UPLOAD, max_pending=UPLOAD_QUEUE_SIZE, workers=UPLOAD_WORKERS):
+        self.enabled = enabled
+        self.s3_service = s3_service
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.workers = workers
+        self.threads = []
+        self.lock = threading.Lock()
+        self.results = {}
+
+    def _s3(self):
+        with self.lock:
+            if self.s3_service is None:
+                from services.aws import S3Services
+                self.s3_service = S3Services()
+            return self.s3_service
+
+    def _start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"s3-upload-{n}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def _result_for(self, job_folder):
+        return self.results.setdefault(job_folder, {
+            "job_title": job_folder,
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "uploaded_files": [],
+            "upload_folders": [],
+            "uploaded_at": [],
+            "total_uploaded": 0,
+            "total_skipped": 0,
+            "total_failed": 0,
+        })
+
+    def submit(self, job_title, section_name, filename, sha256, buffer=None):
+        """Queue a stored CV (or an in-memory CvBuffer) for upload. Blocks while the queue is full."""
+        if not self.enabled:
+            if buffer is not None:
+                self._keep_locally(sha256, buffer)
+            return
+        self._start()
+        self.queue.put((clean_job_title(job_title), section_folder(section_name), filename, sha256, buffer))
+
+    @staticmethod
+    def _keep_locally(sha256, buffer):
+        """Move an in-memory CV into the local store so the final sweep can upload it."""
+        store = get_cv_store()
+        try:
+            if buffer.file is not None and not store.uploaded_key(sha256) and not os.path.exists(store.local_path(sha256)):
+                buffer.spill_to(store.local_path(sha256))
+        finally:
+            buffer.close()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            job_folder, section, filename, sha256, buffer = item
+            try:
+                uploaded = self._s3().upload_ref(job_folder, section, filename, sha256,
+                                                 fileobj=buffer.file if buffer is not None else None)
+                with self.lock:
+                    if uploaded.get("skipped"):
+                        self._result_for(job_folder)["total_skipped"] += 1
+                    else:
+                        self._record(job_folder, [uploaded])
+            except Exception as e:
+                # left pending in the CV store; drain() retries it
+                print(f"    WARN: upload of {filename} failed ({e}); will retry at the end of the run")
+                if buffer is not None:
+                    self._keep_locally(sha256, buffer)
+            finally:
+                if buffer is not None:
+                    buffer.close()
+                self.queue.task_done()
+
+    def _record(self, job_folder, uploaded_files):
+        result = self._result_for(job_folder)
+        for uploaded in uploaded_files:
+            folder = uploaded["s3_key"].rsplit("/", 1)[0] + "/"
+            if folder not in result["upload_folders"]:
+                result["upload_folders"].append(folder)
+            result["uploaded_files"].append(uploaded)
+            result["uploaded_at"].append(datetime.now().isoformat())
+            result["total_uploaded"] += 1
+
+    def drain(self, bucket_name=None):
+        """
+        Wait for queued uploads, stop the workers, then upload anything still pending
+        (failed uploads, files dropped into tmp/ by hand). Returns the run's results.
+        """
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+        swept_jobs = set()
+        try:
+            for swept in self._s3().upload_all_tmp_files_to_s3(bucket_name):
+                job_folder = clean_job_title(swept["job_title"])
+                swept_jobs.add(job_folder)
+                self._record(job_folder, swept["uploaded_files"])
+                self._result_for(job_folder)["total_skipped"] += swept["total_skipped"]
+            # jobs uploaded entirely by the workers still need their S3 manifest
+            self._s3().write_manifests([job for job in self.results if job not in swept_jobs], bucket_name)
+            self._s3().index.flush()
+        except Exception as e:
+            print(f"ERROR: S3 upload failed: {e}")
+        store = get_cv_store()
+        for job_folder in store.pending_job_folders():
+            self._result_for(job_folder)["total_failed"] = len(store.pending_refs(job_folder))
+
+        results = list(self.results.values())
+        self.results = {}
+        return results
+
+
+uploader = StreamingUploader()
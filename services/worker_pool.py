@@ -0,0 +1,130 @@
+from services.google_service import GoogleServices
+from services.playwright import login_to_portal, ensure_logged_in, process_job, is_logged_in
+from config.settings import SCRAPER_WORKERS, SCRAPER_WORKER_STAGGER, SCRAPER_JOB_MAX_ATTEMPTS, SLOW_MO
+from services.browser_profile import new_scraping_context
+from services.session import load_storage_state
+from playwright.sync_api import sync_playwright
+import queue
+import threading
+import time
+
+# Guards the per-job failure counts shared by every worker
+attempts_lock = threading.Lock()
+
+
+def build_job_queue(sheet_jobs, tracker):
+    """Queue (index, job) pairs, putting jobs a worker was in the middle of first."""
+    jobs = queue.Queue()
+    in_progress = []
+    pending = []
+    for i, sheet_job in enumerate(sheet_jobs):
+        if tracker.find_resume_state(sheet_job["job"]):
+            in_progress.append((i, sheet_job))
+        else:
+            pending.append((i, sheet_job))
+    for item in in_progress + pending:
+        jobs.put(item)
+    return jobs
+
+
+def run_worker(worker_id, jobs, tracker, completed, gs, attempts, stagger=SCRAPER_WORKER_STAGGER):
+    """
+    Process jobs from the shared queue in an isolated browser until the queue is empty.
+    Each worker keeps its own resume state, so a crash only affects its current job:
+    the job goes back on the queue (up to SCRAPER_JOB_MAX_ATTEMPTS tries, counted in the
+    shared `attempts` dict) and the worker carries on in a fresh context.
+    Sheet updates go through the shared GoogleServices `gs`, which batches them.
+    """
+    # Stagger logins so the portal doesn't see every worker authenticate at once;
+    # workers that start late usually pick up the session saved by the first one
+    time.sleep(worker_id * stagger)
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=False, slow_mo=SLOW_MO)
+        context = page = None
+
+        try:
+            while True:
+                try:
+                    current = jobs.get_nowait()
+                except queue.Empty:
+                    break
+
+                i, sheet_job = current
+                job = sheet_job["job"]
+                print(f"[worker {worker_id}] Picked up job {i}: {job}")
+                try:
+                    if page is None:
+                        context = new_scraping_context(browser, storage_state=load_storage_state())
+                        page = context.new_page()
+                        ensure_logged_in(page)
+                    if not tracker.claim_resume_state(job, worker_id):
+                        tracker.set_resume_state(i, job, "", 1, 0, worker=worker_id)
+                        tracker.save_tracker()
+                    if not is_logged_in(page):
+                        print(f"[worker {worker_id}] Session expired, logging in again")
+                        login_to_portal(page)
+                    # only a job whose every CV was stored is marked scraped; the rest are retried next run
+                    if process_job(page, sheet_job, i, tracker=tracker, worker=worker_id):
+                        gs.writetotrackersheet(jobid=sheet_job["id"])
+                        completed.append(current)
+                    else:
+                        print(f"[worker {worker_id}] Job {i} not completed; leaving it unscraped")
+
+                    tracker.clear_resume_state(worker=worker_id)
+                    tracker.save_tracker()
+                except Exception as e:
+                    print(f"\n[worker {worker_id}] Job {i} failed: {e}")
+                    screenshot = f"error_screenshot_worker{worker_id}.png"
+                    try:
+                        page.screenshot(path=screenshot)
+                        print(f"[worker {worker_id}] An error screenshot has been saved as '{screenshot}'")
+                    except Exception:
+                        pass
+                    # Hand the job and its resume state back so a retry picks up where it failed, unless it keeps failing
+                    tracker.release_resume_state(worker_id)
+                    tracker.save_tracker(force=True)
+                    with attempts_lock:
+                        attempts[i] = attempts.get(i, 0) + 1
+                        failures = attempts[i]
+                    if failures < SCRAPER_JOB_MAX_ATTEMPTS:
+                        jobs.put(current)
+                    else:
+                        print(f"[worker {worker_id}] Giving up on job {i} after {failures} failed attempts")
+                    # Whatever broke may have left the page unusable, so start the next job fresh
+                    if context is not None:
+                        try:
+                            context.close()
+                        except Exception:
+                            pass
+                    context = page = None
+
+            print(f"[worker {worker_id}] No jobs left, shutting down.")
+        finally:
+            tracker.save_tracker(force=True)
+            browser.close()
+
+
+def run_worker_pool(sheet_jobs, tracker, workers=SCRAPER_WORKERS, gs=None):
+    """Scrape sheet jobs with `workers` concurrent browser contexts. Returns the completed (index, job) pairs."""
+    gs = gs or GoogleServices()
+    jobs = build_job_queue(sheet_jobs, tracker)
+    workers = max(1, min(workers, len(sheet_jobs)))
+    completed = []
+    attempts = {}
+
+    print(f"Starting {workers} workers for {len(sheet_jobs)} jobs")
+    start_time = time.time()
+    threads = [
+        threading.Thread(target=run_worker, args=(worker_id, jobs, tracker, completed, gs, attempts), name=f"scraper-worker-{worker_id}")
+        for worker_id in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gs.flush()
+
+    elapsed = time.time() - start_time
+    print(f"Worker pool finished {len(completed)}/{len(sheet_jobs)} jobs in {elapsed:.2f} seconds")
+    return completed
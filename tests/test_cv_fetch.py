@@ -0,0 +1,55 @@
+from services.cv_fetch import CvFetcher, id_tokens
+
+
+def make_fetcher():
+    return CvFetcher([], concurrency=1)
+
+
+def test_template_is_confirmed_on_a_third_row():
+    fetcher = make_fetcher()
+    try:
+        assert not fetcher.learn("https://portal/vacancy/5555/cv/1001", {"a": "5555", "b": "1001"})
+        assert not fetcher.learn("https://portal/vacancy/5555/cv/1002", {"a": "5555", "b": "1002"})
+        assert fetcher.resolve({"a": "5555", "b": "1003"}) is None
+        assert fetcher.learn("https://portal/vacancy/5555/cv/1003", {"a": "5555", "b": "1003"})
+        assert fetcher.resolve({"a": "5555", "b": "1004"}) == "https://portal/vacancy/5555/cv/1004"
+    finally:
+        fetcher.close()
+
+
+def test_template_the_held_out_row_contradicts_is_dropped():
+    fetcher = make_fetcher()
+    try:
+        fetcher.learn("https://portal/cv/1001", {"b": "1001"})
+        fetcher.learn("https://portal/cv/1002", {"b": "1002"})
+        # the third row's CV isn't at the predicted URL
+        assert not fetcher.learn("https://portal/cv/7777", {"b": "1003"})
+        assert fetcher.template is None
+    finally:
+        fetcher.close()
+
+
+def test_value_shared_by_every_row_is_never_the_token():
+    fetcher = make_fetcher()
+    try:
+        # the per-row id isn't among the row tokens; only the vacancy id matches
+        fetcher.learn("https://portal/vacancy/5555/cv?file=abc", {"a": "5555"})
+        assert not fetcher.learn("https://portal/vacancy/5555/cv?file=def", {"a": "5555"})
+        assert fetcher.template is None
+    finally:
+        fetcher.close()
+
+
+def test_token_inside_a_longer_id_is_not_a_match():
+    fetcher = make_fetcher()
+    try:
+        for row_no, attachment in ((1, 880041), (2, 880042), (3, 880043)):
+            fetcher.learn(f"https://portal/attachments/{attachment}/download", {"rowNo": str(row_no), "x": "9999"})
+        assert fetcher.template is None
+    finally:
+        fetcher.close()
+
+
+def test_json_tokens_keep_only_id_shaped_values():
+    tokens = id_tokens({"rowNo": "3", "attachment.id": "880043", "cvUrl": "/files/880043/cv.pdf", "name": "Ann Lee"})
+    assert tokens == {"attachment.id#0": "880043", "cvUrl#0": "880043"}
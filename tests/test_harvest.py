@@ -0,0 +1,71 @@
+from services.harvest import TableHarvester, choose_records, extract_records, records_match_rows, row_identity
+
+
+def test_nested_shared_id_is_not_the_row_identity():
+    body = {"content": [
+        {"jobseekerName": "Ann Lee", "vacancy": {"id": 999}, "id": 1},
+        {"jobseekerName": "Bo Tan", "vacancy": {"id": 999}, "id": 2},
+    ]}
+    records, _ = extract_records(body)
+    assert [row_identity(r) for r in records] == ["id:1", "id:2"]
+
+
+def test_nested_id_only_falls_back_to_name_and_date():
+    body = {"content": [
+        {"jobseekerName": "Ann Lee", "appliedDate": "2024-01-02", "vacancy": {"id": 999}},
+        {"jobseekerName": "Bo Tan", "appliedDate": "2024-01-03", "vacancy": {"id": 999}},
+    ]}
+    records, _ = extract_records(body)
+    assert [row_identity(r) for r in records] == [
+        "name:ann lee|date:2024-01-02",
+        "name:bo tan|date:2024-01-03",
+    ]
+
+
+def test_ids_repeated_across_the_page_are_dropped():
+    body = {"content": [
+        {"jobseekerName": "Ann Lee", "appliedDate": "2024-01-02", "candidate": {"candidateId": 7}},
+        {"jobseekerName": "Bo Tan", "appliedDate": "2024-01-03", "candidate": {"candidateId": 7}},
+    ], "totalElements": 2}
+    records, total = extract_records(body)
+    assert total == 2
+    assert [r["id"] for r in records] == [None, None]
+    assert row_identity(records[1]) == "name:bo tan|date:2024-01-03"
+
+
+def test_specific_nested_id_is_used_when_unique():
+    body = {"content": [
+        {"jobseekerName": "Ann Lee", "jobseeker": {"jobseekerId": 11}, "vacancy": {"id": 999}},
+        {"jobseekerName": "Bo Tan", "jobseeker": {"jobseekerId": 12}, "vacancy": {"id": 999}},
+    ]}
+    records, _ = extract_records(body)
+    assert [row_identity(r) for r in records] == ["id:11", "id:12"]
+
+
+def test_records_must_match_the_rows_on_screen():
+    records, _ = extract_records({"content": [
+        {"jobseekerName": "Ann Lee", "id": 1},
+        {"jobseekerName": "Bo Tan", "id": 2},
+    ]})
+    assert records_match_rows(records, [{"name": "ann  LEE"}, {"name": "Tan, Bo"}])
+    # sorted differently on the client
+    assert not records_match_rows(records, [{"name": "Bo Tan"}, {"name": "Ann Lee"}])
+    assert not records_match_rows(records, [{"name": "Ann Lee"}])
+    assert not records_match_rows(records, [{"name": "Ann Lee"}, {"name": None}])
+
+
+def test_snapshot_is_used_unless_the_response_matches_it():
+    class Page:
+        def on(self, event, handler):
+            pass
+
+    harvester = TableHarvester(Page())
+    body = {"totalElements": 2, "content": [{"jobseekerName": "Ann Lee", "id": 1}, {"jobseekerName": "Bo Tan", "id": 2}]}
+    snapshot = [{"name": "Ann Lee"}, {"name": "Bo Tan"}]
+    assert choose_records(harvester, "Applicants", body, snapshot, 2)[0]["id"] == "1"
+    assert harvester.totals["Applicants"] == 2
+    # sorted differently on screen, the page is missing a row, or there was no response
+    reordered = snapshot[::-1]
+    assert choose_records(harvester, "Applicants", body, reordered, 2) is reordered
+    assert choose_records(harvester, "Applicants", body, snapshot[:1], 1) == snapshot[:1]
+    assert choose_records(harvester, "Applicants", None, snapshot, 2) is snapshot
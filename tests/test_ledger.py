@@ -0,0 +1,31 @@
+import pytest
+
+from services.cv_store import CvStore
+from services.ledger import SubmissionLedger, SUBMITTED, ACCEPTED, FAILED
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    store = CvStore(db_file=str(tmp_path / "cv_store.db"), cas_dir=str(tmp_path / "cas"))
+    store.record_upload("2024-01-01/job/applicants/a.pdf", "sha-a", 10)
+    store.record_upload("2024-01-02/job/applicants/a.pdf", "sha-a", 10)
+    return SubmissionLedger(db_file=str(tmp_path / "ledger.db"), store=store)
+
+
+def test_only_accepted_keys_are_filtered(ledger):
+    ledger.record("ec2", ["k1"], SUBMITTED)
+    ledger.record("ec2", ["k2"], FAILED)
+    ledger.record("ec2", ["k3"], ACCEPTED)
+    assert ledger.filter_new("ec2", ["k1", "k2", "k3"]) == (["k1", "k2"], ["k3"])
+
+
+def test_accepted_content_is_recognised_under_another_key(ledger):
+    ledger.record("ec2", ["2024-01-01/job/applicants/a.pdf"], ACCEPTED)
+    assert ledger.filter_new("ec2", ["2024-01-02/job/applicants/a.pdf"]) == ([], ["2024-01-02/job/applicants/a.pdf"])
+    # another endpoint hasn't seen it
+    assert ledger.filter_new("parser", ["2024-01-02/job/applicants/a.pdf"]) == (["2024-01-02/job/applicants/a.pdf"], [])
+
+
+def test_same_content_twice_in_one_batch_is_sent_once(ledger):
+    keys = ["2024-01-01/job/applicants/a.pdf", "2024-01-02/job/applicants/a.pdf"]
+    assert ledger.filter_new("ec2", keys) == (keys[:1], keys[1:])
@@ -0,0 +1,22 @@
+from services.outbox import Outbox
+
+
+def test_dependent_entry_waits_for_its_dependency(tmp_path):
+    outbox = Outbox(db_file=str(tmp_path / "outbox.db"), max_attempts=2)
+    processing = outbox.enqueue("ec2_process", {"keys": ["a"]})
+    grouping = outbox.enqueue("resume_parser", {"ids": ["x"]}, depends_on=processing)
+
+    assert [entry[0] for entry in outbox.claim()] == [processing]
+    outbox.mark_delivered(processing)
+    assert [entry[0] for entry in outbox.claim()] == [grouping]
+
+
+def test_dependent_entry_gives_up_with_its_dependency(tmp_path):
+    outbox = Outbox(db_file=str(tmp_path / "outbox.db"), max_attempts=1)
+    processing = outbox.enqueue("ec2_process", {"keys": ["a"]})
+    outbox.enqueue("resume_parser", {"ids": ["x"]}, depends_on=processing)
+
+    outbox.claim()
+    outbox.mark_failed(processing, 0, "boom")
+    assert outbox.claim() == []
+    assert outbox.counts() == {"pending": 0, "failed": 2, "delivered": 0}
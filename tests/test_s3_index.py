@@ -0,0 +1,65 @@
+from datetime import datetime
+import io
+import json
+
+import pytest
+
+from services.s3_index import S3DailyIndex, legacy_index_key, window_days
+
+
+class FakePaginator:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def paginate(self, Bucket, Prefix):
+        yield {"Contents": [{"Key": key} for key in sorted(self.objects) if key.startswith(Prefix)]}
+
+
+class FakeS3:
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+
+    def get_object(self, Bucket, Key):
+        from botocore.exceptions import ClientError
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": '"1"'}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+
+    def get_paginator(self, name):
+        return FakePaginator(self.objects)
+
+
+def test_window_days_covers_every_partition_touched():
+    assert window_days(30, datetime(2024, 3, 2, 1, 0)) == ["2024-02-29", "2024-03-01", "2024-03-02"]
+    assert window_days(1, datetime(2024, 3, 2, 12, 0)) == ["2024-03-02"]
+
+
+def test_each_flush_writes_its_own_object_and_reads_merge_them():
+    pytest.importorskip("botocore")
+    legacy = json.dumps({"key": "2024-03-02/Welder/applicants/b.pdf", "job_folder": "Welder"}) + "\n"
+    s3 = FakeS3({legacy_index_key("2024-03-02"): legacy.encode("utf-8")})
+    index = S3DailyIndex(s3, "bucket", flush_every=1)
+    other_runner = S3DailyIndex(s3, "bucket", flush_every=1)
+    index.add("2024-03-02/Data Analyst/applicants/a.pdf", "aa", 1, "Data Analyst (Sr.)")
+    other_runner.add("2024-03-02/Cook/possible_matches/c.pdf", "cc", 1, "Cook")
+    index.add("2024-03-02/Data Analyst/applicants/d.pdf", "dd", 1, "Data Analyst (Sr.)")
+
+    assert len([key for key in s3.objects if key.startswith("index/2024-03-02/")]) == 3
+    assert len(index.read("2024-03-02")) == 4
+    assert index.job_titles(["2024-03-02"]) == ["Cook", "Data Analyst (Sr.)", "Welder"]
+    assert index.read("2024-03-03") is None
+
+
+def test_entries_stay_queued_when_the_write_times_out():
+    botocore_exceptions = pytest.importorskip("botocore.exceptions")
+
+    class FlakyS3(FakeS3):
+        def put_object(self, Bucket, Key, Body, **kwargs):
+            raise botocore_exceptions.ConnectTimeoutError(endpoint_url="https://s3")
+
+    index = S3DailyIndex(FlakyS3(), "bucket", flush_every=1)
+    index.add("2024-03-02/Welder/applicants/a.pdf", "aa", 1)
+    assert [entry["key"] for entry in index.pending] == ["2024-03-02/Welder/applicants/a.pdf"]
@@ -0,0 +1,48 @@
+from services.tracker import JsonTrackerBackend, ScrapingTracker, SqliteTrackerBackend
+
+
+def test_json_backend_saves_downloaded_files_and_vacancies(tmp_path):
+    tracker_file = str(tmp_path / "tracker.json")
+    tracker = ScrapingTracker(tracker_file, backend=JsonTrackerBackend(tracker_file))
+    tracker.mark_file_downloaded("Welder", "Applicants", "a.pdf", identity="id:1")
+    tracker.remember_vacancy("Welder", "https://example.com/vacancy/42")
+    tracker.save_tracker()
+
+    reloaded = ScrapingTracker(tracker_file, backend=JsonTrackerBackend(tracker_file))
+    assert reloaded.is_file_downloaded("Welder", "Applicants", "a.pdf")
+    assert reloaded.is_applicant_downloaded("Welder", "Applicants", "id:1")
+    assert reloaded.find_vacancy("welder")["url"] == "https://example.com/vacancy/42"
+
+    reloaded.forget_vacancy("Welder")
+    reloaded.save_tracker()
+    assert ScrapingTracker(tracker_file, backend=JsonTrackerBackend(tracker_file)).find_vacancy("Welder") is None
+
+
+def test_failed_job_keeps_its_resume_state_when_the_worker_moves_on(tmp_path):
+    tracker_file = str(tmp_path / "tracker.json")
+    tracker = ScrapingTracker(tracker_file, backend=JsonTrackerBackend(tracker_file))
+    tracker.set_resume_state(0, "Welder", "Applicants", 3, 7, worker=1)
+    tracker.release_resume_state(1)
+    # the same worker takes the next job
+    assert not tracker.claim_resume_state("Cook", 1)
+    tracker.set_resume_state(1, "Cook", "", 1, 0, worker=1)
+
+    state = tracker.claim_resume_state("welder ", 2)
+    assert (state["current_page"], state["current_row"]) == (3, 7)
+    assert tracker.get_resume_state(worker=2) is state
+
+
+def test_sqlite_backend_migrates_every_json_section(tmp_path):
+    tracker_file = str(tmp_path / "tracker.json")
+    tracker = ScrapingTracker(tracker_file, backend=JsonTrackerBackend(tracker_file))
+    tracker.mark_file_downloaded("Welder", "Applicants", "a.pdf", identity="name:ann lee|2024-01-02")
+    tracker.remember_vacancy("Welder", "https://example.com/vacancy/42")
+    tracker.update_job_info("Welder")
+    tracker.save_tracker(force=True)
+
+    backend = SqliteTrackerBackend(str(tmp_path / "tracker.db"), legacy_json_file=tracker_file)
+    migrated = ScrapingTracker(tracker_file, backend=backend)
+    assert migrated.is_file_downloaded("Welder", "Applicants", "a.pdf")
+    assert migrated.is_applicant_downloaded("Welder", "Applicants", "name:ann lee|2024-01-02")
+    assert migrated.find_vacancy("Welder")["id"] == "42"
+    assert "Welder" in migrated.data["jobs"]